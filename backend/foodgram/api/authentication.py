@@ -0,0 +1,64 @@
+import hashlib
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.cache import LRUCache
+from users.models import User
+
+local_tokens = LRUCache(settings.AUTH_TOKEN_LOCAL_CACHE_SIZE)
+
+
+def token_cache_key(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_token(key):
+    """Удаление токена из кэшей: общего и текущего процесса."""
+    cache_key = token_cache_key(key)
+    caches['tokens'].delete(cache_key)
+    local_tokens.delete(cache_key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену без запроса к базе на каждый вызов.
+
+    В LRU процесса (AUTH_TOKEN_LOCAL_TTL секунд) и в кэше Django
+    tokens (AUTH_TOKEN_CACHE_TIMEOUT секунд), общем для процессов,
+    хранятся только id пользователя, is_active и ключ токена.
+    Остальные поля пользователя загружаются одним запросом при первом
+    обращении к ним. При выходе, смене пароля и любом сохранении
+    пользователя записи удаляются (api.signals); другие процессы видят
+    изменение не позже чем через AUTH_TOKEN_LOCAL_TTL секунд.
+    """
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        entry = local_tokens.get(cache_key)
+        if entry is not None and entry[0] > monotonic():
+            data = entry[1]
+        else:
+            token_cache = caches['tokens']
+            data = token_cache.get(cache_key)
+            if data is None:
+                user, token = super().authenticate_credentials(key)
+                data = (user.pk, user.is_active, token.key)
+                token_cache.set(
+                    cache_key, data, settings.AUTH_TOKEN_CACHE_TIMEOUT
+                )
+            local_tokens.set(
+                cache_key, (monotonic() + settings.AUTH_TOKEN_LOCAL_TTL, data)
+            )
+        user_id, is_active, token_key = data
+        if not is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        user = User.from_db(
+            User.objects.db, ('id', 'is_active'), (user_id, is_active)
+        )
+        return (user, Token(key=token_key, user=user))
@@ -0,0 +1,86 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+TAGS_VERSION = 'tags'
+INGREDIENTS_VERSION = 'ingredients'
+USERS_VERSION = 'users'
+SCORES_VERSION = 'recipe_scores'
+
+
+def user_version(user_id):
+    """Версия пользовательских данных: избранное, покупки, подписки."""
+    return f'user:{user_id}'
+
+
+def initial_version():
+    """Начальная версия: время в микросекундах.
+
+    Версия, созданная заново после вытеснения ключа из кэша, больше
+    всех прежних значений счётчика, поэтому старые записи не читаются.
+    """
+    return time.time_ns() // 1000
+
+
+def get_version(name):
+    """Версия данных из общего кэша: счётчик изменений."""
+    key = f'version:{name}'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, initial_version(), timeout=None)
+        version = cache.get(key, initial_version())
+    return version
+
+
+def bump_version(name):
+    """Увеличение версии одной атомарной операцией incr.
+
+    Атомарность зависит от бэкенда: incr атомарен в memcached
+    и LocMemCache, FileBasedCache годится только для разработки.
+    """
+    key = f'version:{name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, initial_version(), timeout=None)
+
+
+def make_etag(*parts):
+    """Сильный ETag по набору значений."""
+    digest = hashlib.md5(
+        ':'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+class LRUCache:
+    """Ограниченный по размеру кэш внутри процесса."""
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.data:
+                return default
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
@@ -0,0 +1,122 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from api.pagination import PageLimitPagination
+
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_THREADS, thread_name_prefix='async-db'
+)
+
+
+def run_in_thread(func, *args, **kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def database_sync_to_async(func):
+    """Вызов синхронного кода с ORM из корутины.
+
+    Код выполняется в потоке db_executor со своим соединением,
+    поэтому несколько вызовов идут параллельно. Соединение потока
+    закрывается, если сломано или устарело (CONN_MAX_AGE), как Django
+    делает на границах запроса; без пула и CONN_MAX_AGE это было бы
+    новое соединение на каждый вызов, поэтому settings требует одно
+    из них при ASYNC_VIEWS. Контекстные переменные, в том числе
+    метрики запроса, передаются в поток.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            db_executor,
+            functools.partial(
+                context.run, run_in_thread, func, *args, **kwargs
+            ),
+        )
+    return wrapper
+
+
+class AsyncReadMixin:
+    """Асинхронная обработка GET-запросов к действиям из async_actions.
+
+    Включается настройкой ASYNC_VIEWS при запуске через ASGI. Действие
+    обрабатывает корутина async_<действие>, а если её нет, синхронный
+    метод выполняется в потоке db_executor. Остальные HTTP-методы тех же
+    маршрутов идут в обычное синхронное представление DRF.
+    """
+    async_actions = ()
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not settings.ASYNC_VIEWS or (
+            actions.get('get') not in cls.async_actions
+        ):
+            return view
+        sync_view = sync_to_async(view, thread_sensitive=True)
+
+        async def async_view(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await sync_view(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            self.action_map = actions
+            for method, action in actions.items():
+                setattr(self, method, getattr(self, action))
+            return await self.async_dispatch(request, *args, **kwargs)
+
+        for attribute in ('cls', 'initkwargs', 'actions', 'csrf_exempt'):
+            setattr(async_view, attribute, getattr(view, attribute))
+        return async_view
+
+    async def async_dispatch(self, request, *args, **kwargs):
+        """APIView.dispatch, в котором обработчик - корутина."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await database_sync_to_async(self.initial)(
+                request, *args, **kwargs
+            )
+            handler = getattr(self, f'async_{self.action}', None)
+            if handler is None:
+                handler = database_sync_to_async(getattr(self, self.action))
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.response
+
+    async def paginate_queryset_async(self, queryset):
+        """Страница, для которой строки и COUNT запрашиваются параллельно."""
+        paginator = self.paginator
+        page_slice = None
+        if isinstance(paginator, PageLimitPagination):
+            page_slice = paginator.get_page_slice(queryset, self.request)
+        if page_slice is None:
+            return await database_sync_to_async(self.paginate_queryset)(
+                queryset
+            )
+        rows, count = await asyncio.gather(
+            database_sync_to_async(list)(page_slice),
+            database_sync_to_async(queryset.count)(),
+        )
+        return paginator.set_page(queryset, self.request, rows, count)
+
+    async def serialize_async(self, *args, **kwargs):
+        """Данные сериализатора, собранные в потоке db_executor."""
+        return await database_sync_to_async(
+            lambda: self.get_serializer(*args, **kwargs).data
+        )()
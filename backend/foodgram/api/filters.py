@@ -1,13 +1,40 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import (Case, Exists, F, IntegerField, OuterRef, Q,
+                              When)
+from django.db.models.functions import Collate, Upper
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from api.cache import TAGS_VERSION, get_version
+from api.mixins import local_cache
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+TRIGRAM_MIN_LENGTH = 3
+
+
+def tag_ids_by_slug():
+    """Словарь slug -> id тегов из кэша, обновляется с версией тегов."""
+    key = f'tag_ids:{get_version(TAGS_VERSION)}'
+    tag_ids = local_cache.get(key)
+    if tag_ids is None:
+        tag_ids = cache.get(key)
+        if tag_ids is None:
+            tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+            cache.set(key, tag_ids, settings.REFERENCE_CACHE_TIMEOUT)
+        local_cache.set(key, tag_ids)
+    return tag_ids
+
+
+def tag_choices():
+    return [(slug, slug) for slug in tag_ids_by_slug()]
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug',
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='get_tags'
     )
     is_favorited = filters.BooleanFilter(
         method='get_is_favorited'
@@ -15,25 +42,113 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='get_search')
+    ordering = filters.ChoiceFilter(
+        choices=(
+            ('popular', 'Популярные'),
+            ('trending', 'Набирающие популярность'),
+        ),
+        method='get_ordering'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'ordering')
+
+    def get_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов: EXISTS без JOIN и DISTINCT."""
+        tag_ids = tag_ids_by_slug()
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'),
+                tag_id__in=[tag_ids[slug] for slug in value]
+            )
+        ))
 
     def get_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(carts__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
+    def get_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию, ингредиентам и описанию.
+
+        Результаты упорядочены по релевантности. Без PostgreSQL
+        ищется вхождение подстроки.
+        """
+        if connection.vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=value)
+                | Q(text__icontains=value)
+                | Q(Exists(RecipeIngredient.objects.filter(
+                    recipe=OuterRef('pk'), ingredient__name__icontains=value
+                )))
+            )
+        query = SearchQuery(
+            value, config=settings.SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', 'id')
+
+    def get_ordering(self, queryset, name, value):
+        """Сортировка по рейтингу из RecipeScore по индексу (рейтинг, id)."""
+        return queryset.filter(score__isnull=False).order_by(
+            f'-score__{value}', 'id'
+        )
+
 
 class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='istartswith')
+    name = filters.CharFilter(method='get_name')
 
     class Meta:
         model = Ingredient
         fields = ('name', )
+
+    def get_name(self, queryset, name, value):
+        """Сначала названия, начинающиеся с value, затем содержащие его.
+
+        Начала названий читаются в порядке индекса UPPER(name) COLLATE "C"
+        не дальше INGREDIENTS_SEARCH_LIMIT строк, поэтому время ответа
+        не растёт с размером справочника. Оставшиеся места занимают
+        вхождения по триграммному индексу; для строк короче
+        TRIGRAM_MIN_LENGTH он не помогает, и вхождения не ищутся.
+        """
+        limit = settings.INGREDIENTS_SEARCH_LIMIT
+        ids = list(self.prefix_matches(queryset, value)[:limit])
+        if len(ids) < limit and len(value) >= TRIGRAM_MIN_LENGTH:
+            ids += self.infix_matches(queryset, value, ids)[
+                :limit - len(ids)
+            ]
+        return queryset.filter(pk__in=ids).order_by(Case(
+            *(When(pk=pk, then=position) for position, pk in enumerate(ids)),
+            output_field=IntegerField(),
+        ))
+
+    @staticmethod
+    def prefix_matches(queryset, value):
+        """id ингредиентов, названия которых начинаются с value."""
+        if connection.vendor == 'postgresql':
+            prefix = queryset.annotate(
+                upper_name=Collate(Upper('name'), 'C')
+            ).filter(
+                upper_name__startswith=value.upper()
+            ).order_by('upper_name', 'pk')
+        else:
+            prefix = queryset.filter(
+                name__istartswith=value
+            ).order_by('name', 'pk')
+        return prefix.values_list('pk', flat=True)
+
+    @staticmethod
+    def infix_matches(queryset, value, exclude=()):
+        """id ингредиентов, названия которых содержат value."""
+        return queryset.filter(name__icontains=value).exclude(
+            pk__in=exclude
+        ).order_by('name', 'pk').values_list('pk', flat=True)
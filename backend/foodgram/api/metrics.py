@@ -0,0 +1,225 @@
+import atexit
+import logging
+import os
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from time import perf_counter, sleep
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from api.models import DUPLICATES, RequestMetric
+
+logger = logging.getLogger(__name__)
+
+MS_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+METRICS = {
+    'total': MS_BUCKETS,
+    'db': MS_BUCKETS,
+    'view': MS_BUCKETS,
+    'render': MS_BUCKETS,
+    'connect': MS_BUCKETS,
+    'pool_wait': MS_BUCKETS,
+    'queries': QUERY_BUCKETS,
+}
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+def metric_name(*parts):
+    return ':'.join(map(str, parts))
+
+
+class RequestMetrics:
+    """Запросы к базе и время обработки одного HTTP-запроса.
+
+    Экземпляр хранится в current_metrics и получает SQL-запросы
+    от record_query; каждый запрос считается по его шаблону.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = perf_counter()
+        self.tag = None
+        self.queries = 0
+        self.db_time = 0
+        self.view_started = None
+        self.view_time = None
+        self.render_time = 0
+        self.connect_time = 0
+        self.pool_wait = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = perf_counter() - started
+            with self.lock:
+                self.db_time += elapsed
+                self.queries += 1
+                self.statements[sql] += 1
+
+    def duplicates(self):
+        """Шаблоны SQL, повторённые не меньше порога: признак N+1."""
+        threshold = settings.REQUEST_METRICS_DUPLICATE_THRESHOLD
+        return [
+            (sql, count) for sql, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+    def values(self):
+        total = perf_counter() - self.started
+        view = self.view_time if self.view_time is not None else total
+        return {
+            'total': total * 1000,
+            'db': self.db_time * 1000,
+            'view': max(view - self.db_time, 0) * 1000,
+            'render': self.render_time * 1000,
+            'connect': self.connect_time * 1000,
+            'pool_wait': self.pool_wait * 1000,
+            'queries': self.queries,
+        }
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка соединений: передаёт запрос метрикам текущего запроса.
+
+    Метрики ищутся в контекстной переменной, поэтому запросы из
+    потоков асинхронных представлений тоже учитываются.
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def record_connection(connection):
+    """Время открытия соединения и ожидания пула (foodgram.db)."""
+    metrics = current_metrics.get()
+    if metrics is not None:
+        with metrics.lock:
+            metrics.connect_time += getattr(connection, 'connect_time', 0)
+            metrics.pool_wait += getattr(connection, 'pool_wait', 0)
+
+
+class MetricsHistogram:
+    """Гистограммы метрик по действиям в памяти процесса.
+
+    Фоновый поток процесса раз в REQUEST_METRICS_FLUSH_INTERVAL секунд
+    прибавляет накопленное к счётчикам RequestMetric в базе, откуда их
+    читает dump_request_metrics; обработка запросов базу не трогает.
+    Поток запускается при первой записи в каждом процессе, при нуле
+    в REQUEST_METRICS_FLUSH_INTERVAL не запускается. Если база
+    недоступна, приращения остаются в памяти до следующего сброса.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = defaultdict(int)
+        self.samples = {}
+        self.flusher_pid = None
+
+    def record(self, tag, values, duplicates=()):
+        with self.lock:
+            self.pending[tag, 'count'] += 1
+            for name, buckets in METRICS.items():
+                value = values[name]
+                bucket = bisect_left(buckets, value)
+                self.pending[tag, metric_name(name, 'bucket', bucket)] += 1
+                self.pending[tag, metric_name(name, 'sum')] += round(value)
+            if duplicates:
+                self.pending[tag, DUPLICATES] += 1
+                self.samples[tag] = duplicates[0]
+            start = (
+                self.flusher_pid != os.getpid()
+                and settings.REQUEST_METRICS_FLUSH_INTERVAL
+            )
+            if start:
+                # После fork поток родителя в процессе не работает.
+                self.flusher_pid = os.getpid()
+        if start:
+            threading.Thread(
+                target=self.flush_periodically, name='request-metrics',
+                daemon=True,
+            ).start()
+            atexit.register(self.flush)
+
+    def flush_periodically(self):
+        while True:
+            sleep(settings.REQUEST_METRICS_FLUSH_INTERVAL)
+            self.flush()
+            # Соединение потока не держится между сбросами.
+            connections.close_all()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(int)
+            samples, self.samples = self.samples, {}
+        try:
+            RequestMetric.objects.add(pending, samples)
+        except DatabaseError:
+            logger.exception('Request metrics were not saved')
+            with self.lock:
+                for key, delta in pending.items():
+                    self.pending[key] += delta
+                for tag, sample in samples.items():
+                    self.samples.setdefault(tag, sample)
+
+    @staticmethod
+    def read():
+        """Сводка по всем действиям из RequestMetric."""
+        values, samples = {}, {}
+        for tag, name, value, sample in RequestMetric.objects.values_list(
+            'tag', 'name', 'value', 'sample'
+        ):
+            values[tag, name] = value
+            if sample:
+                samples[tag] = sample
+        report = {}
+        for tag in sorted({tag for tag, _ in values}):
+            count = values.get((tag, 'count'), 0)
+            if not count:
+                continue
+            entry = {
+                'count': count,
+                'duplicates': values.get((tag, DUPLICATES), 0),
+                'duplicate_sample': samples.get(tag),
+            }
+            for name, buckets in METRICS.items():
+                counts = [
+                    values.get((tag, metric_name(name, 'bucket', bucket)), 0)
+                    for bucket in range(len(buckets) + 1)
+                ]
+                entry[name] = {
+                    'mean': values.get((tag, metric_name(name, 'sum')), 0)
+                    / count,
+                    'p50': percentile(counts, buckets, 0.5),
+                    'p95': percentile(counts, buckets, 0.95),
+                    'p99': percentile(counts, buckets, 0.99),
+                    'histogram': counts,
+                }
+            report[tag] = entry
+        return report
+
+    @staticmethod
+    def reset():
+        RequestMetric.objects.all().delete()
+
+
+def percentile(counts, buckets, fraction):
+    """Верхняя граница корзины, в которую попадает перцентиль."""
+    total = sum(counts)
+    if not total:
+        return None
+    seen = 0
+    for index, count in enumerate(counts):
+        seen += count
+        if seen >= total * fraction:
+            return buckets[index] if index < len(buckets) else float('inf')
+    return float('inf')
+
+
+histogram = MetricsHistogram()
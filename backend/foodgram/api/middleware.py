@@ -0,0 +1,104 @@
+import asyncio
+from time import perf_counter
+
+from django.conf import settings
+
+from api.metrics import RequestMetrics, current_metrics, histogram, logger
+
+
+def view_tag(view_func, method):
+    """Имя действия: RecipeViewSet.list, UserViewSet.subscriptions."""
+    view_class = getattr(view_func, 'cls', None)
+    actions = getattr(view_func, 'actions', None) or {}
+    if view_class is None:
+        return getattr(view_func, '__name__', 'unknown')
+    action = actions.get(method.lower(), method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class RequestMetricsMiddleware:
+    """Число запросов к базе и время обработки по действиям API.
+
+    Для каждого запроса считаются запросы и время в базе, время
+    представления без базы (в основном сериализация), время рендеринга,
+    открытия соединений и ожидания пула и общее время. Значения попадают
+    в заголовок Server-Timing (REQUEST_METRICS_SERVER_TIMING)
+    и в гистограммы api.metrics.
+    Повторяющиеся SQL-запросы пишутся в журнал как возможный N+1.
+    Запросы при потоковой отдаче ответа после его начала не учитываются.
+    Работает и в синхронном, и в асинхронном стеке.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Как в django.utils.deprecation.MiddlewareMixin.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.REQUEST_METRICS_ENABLED:
+            return self.get_response(request)
+        metrics = request.metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(metrics, response)
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_METRICS_ENABLED:
+            return await self.get_response(request)
+        metrics = request.metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(metrics, response)
+
+    def finish(self, metrics, response):
+        if metrics.tag is None:
+            return response
+        values = metrics.values()
+        duplicates = metrics.duplicates()
+        for sql, count in duplicates:
+            logger.warning(
+                '%s: SQL executed %d times in one request: %s',
+                metrics.tag, count, sql[:500]
+            )
+        histogram.record(
+            metrics.tag, values, [sql for sql, _ in duplicates]
+        )
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={values["db"]:.1f};desc="{metrics.queries} queries"',
+                f'view;dur={values["view"]:.1f}',
+                f'render;dur={values["render"]:.1f}',
+                f'connect;dur={values["connect"]:.1f}',
+                f'pool;dur={values["pool_wait"]:.1f}',
+                f'total;dur={values["total"]:.1f}',
+            ))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = getattr(request, 'metrics', None)
+        if metrics is not None:
+            metrics.tag = view_tag(view_func, request.method)
+            metrics.view_started = perf_counter()
+
+    def process_template_response(self, request, response):
+        metrics = getattr(request, 'metrics', None)
+        if metrics is not None and metrics.tag is not None:
+            render_started = perf_counter()
+            metrics.view_time = render_started - metrics.view_started
+
+            def finish_render(response):
+                metrics.render_time = perf_counter() - render_started
+
+            response.add_post_render_callback(finish_render)
+        return response
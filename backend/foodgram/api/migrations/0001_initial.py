@@ -0,0 +1,32 @@
+# Generated by Django 3.2 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=150, verbose_name='Действие')),
+                ('name', models.CharField(max_length=50, verbose_name='Метрика')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Значение')),
+                ('sample', models.TextField(blank=True, verbose_name='Пример повторяющегося SQL')),
+            ],
+            options={
+                'verbose_name': 'Метрика запросов',
+                'verbose_name_plural': 'Метрики запросов',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='requestmetric',
+            constraint=models.UniqueConstraint(fields=('tag', 'name'), name='request_metric_tag_name_uniq'),
+        ),
+    ]
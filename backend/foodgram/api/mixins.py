@@ -1,19 +1,143 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
 from rest_framework import status
 from rest_framework.response import Response
 
+from api.cache import (LRUCache, bump_version, get_version, make_etag,
+                       user_version)
+from recipes.counters import change_counters
+
+local_cache = LRUCache(settings.REFERENCE_LOCAL_CACHE_SIZE)
+
 
 class AddRemoveMixin:
-    def add(self, request, serializer_class, data):
+    """Добавление и удаление связей пользователя.
+
+    counters - счётчики, которые меняются вместе со связью:
+    кортежи (модель, ключ в data, поле счётчика).
+    """
+    @staticmethod
+    def bump_user_version(user_id):
+        """Новая версия данных пользователя после фиксации транзакции.
+
+        Иначе параллельный GET может закэшировать ещё не изменённые
+        строки под новым ETag.
+        """
+        transaction.on_commit(
+            lambda: bump_version(user_version(user_id))
+        )
+
+    def add(self, request, serializer_class, data, counters=()):
         serializer = serializer_class(
             data=data,
             context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
+            change_counters(counters, data, 1)
+        self.bump_user_version(data['user'])
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    def remove(self, model, data):
+    def remove(self, model, data, counters=()):
         object = get_object_or_404(model, **data)
-        object.delete()
+        with transaction.atomic():
+            object.delete()
+            change_counters(counters, data, -1)
+        self.bump_user_version(data['user'])
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ConditionalGetMixin:
+    """Ответ 304 на повторные запросы до сериализации данных.
+
+    Наследники возвращают из get_etag_parts значения, от которых
+    зависит ответ; None отключает проверку.
+    """
+    def get_etag_parts(self):
+        raise NotImplementedError
+
+    def conditional_response(self, view, request, *args, **kwargs):
+        etag = self.get_etag(self.get_etag_parts())
+        response = self.get_not_modified(request, etag)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        return self.set_etag(response, etag)
+
+    def get_etag(self, parts):
+        if parts is None:
+            return None
+        return make_etag(*parts, self.request.get_full_path())
+
+    def get_not_modified(self, request, etag):
+        """Ответ 304, если у клиента актуальная версия."""
+        if etag is None:
+            return None
+        return get_conditional_response(request, etag=etag)
+
+    def set_etag(self, response, etag):
+        if etag is not None and (
+            200 <= response.status_code < 300 or response.status_code == 304
+        ):
+            response['ETag'] = etag
+        return response
+
+
+class ReferenceCacheMixin:
+    """Кэширование справочников: LRU процесса поверх общего кэша Django.
+
+    Ключи включают версию справочника, которая меняется при каждом
+    сохранении или удалении записи (api.signals), поэтому устаревшие
+    записи не читаются и вытесняются сами. Повторный запрос проверяется
+    только по ETag: версия - счётчик, а не время изменения.
+    """
+    cache_version = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, view, request, *args, **kwargs):
+        version = get_version(self.cache_version)
+        path = request.get_full_path()
+        etag = make_etag(self.cache_version, version, path)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            key = f'{self.cache_version}:{version}:{path}'
+            data = local_cache.get(key)
+            if data is None:
+                data = cache.get(key)
+                if data is None:
+                    data = view(request, *args, **kwargs).data
+                    cache.set(key, data, settings.REFERENCE_CACHE_TIMEOUT)
+                local_cache.set(key, data)
+            response = Response(data)
+        response['ETag'] = etag
+        return response
+
+
+class CursorPaginationMixin:
+    """Пагинация по курсору по запросу клиента.
+
+    Включается параметром pagination=cursor, ссылки next/previous
+    содержат параметр cursor. Порядок задаёт ordering класса пагинации,
+    параметры с другой сортировкой (sorting_params) дают ответ 400.
+    """
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if self.cursor_pagination_class is not None and (
+                params.get('pagination') == 'cursor' or 'cursor' in params
+            ):
+                self._paginator = self.cursor_pagination_class()
+        return super().paginator
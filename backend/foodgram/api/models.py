@@ -0,0 +1,59 @@
+from django.db import models, transaction
+
+DUPLICATES = 'duplicates'
+
+
+class RequestMetricManager(models.Manager):
+    def add(self, deltas, samples):
+        """Прибавление приращений к счётчикам метрик.
+
+        deltas - словарь {(действие, метрика): приращение}, samples -
+        {действие: пример повторяющегося SQL}. Строки блокируются
+        до конца транзакции, поэтому одновременные сбросы нескольких
+        процессов не теряют приращений.
+        """
+        if not deltas:
+            return
+        with transaction.atomic():
+            self.bulk_create(
+                (self.model(tag=tag, name=name) for tag, name in deltas),
+                ignore_conflicts=True,
+            )
+            metrics = self.select_for_update().filter(
+                tag__in={tag for tag, _ in deltas}
+            ).order_by('pk')
+            to_update = []
+            for metric in metrics:
+                delta = deltas.get((metric.tag, metric.name))
+                if delta is None:
+                    continue
+                metric.value += delta
+                if metric.name == DUPLICATES and metric.tag in samples:
+                    metric.sample = samples[metric.tag]
+                to_update.append(metric)
+            self.bulk_update(to_update, ('value', 'sample'))
+
+
+class RequestMetric(models.Model):
+    """Счётчик метрики одного действия API для dump_request_metrics.
+
+    Заполняется api.metrics.MetricsHistogram из всех процессов.
+    """
+    tag = models.CharField('Действие', max_length=150)
+    name = models.CharField('Метрика', max_length=50)
+    value = models.BigIntegerField('Значение', default=0)
+    sample = models.TextField('Пример повторяющегося SQL', blank=True)
+
+    objects = RequestMetricManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('tag', 'name'), name='request_metric_tag_name_uniq'
+            ),
+        ]
+        verbose_name = 'Метрика запросов'
+        verbose_name_plural = 'Метрики запросов'
+
+    def __str__(self):
+        return f'{self.tag} {self.name}: {self.value}'
@@ -1,5 +1,176 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import b64decode, b64encode
+
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+
+BIGINT_MIN, BIGINT_MAX = -2 ** 63, 2 ** 63 - 1
 
 
 class PageLimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+    def get_page_slice(self, queryset, request):
+        """Срез queryset для страницы без подсчёта записей.
+
+        None, если номер страницы нельзя понять без COUNT (page=last)
+        или он заведомо неверен: такие запросы идут обычным путём.
+        """
+        page_size = self.get_page_size(request)
+        number = str(request.query_params.get(self.page_query_param, 1))
+        if not page_size or not number.isdigit() or int(number) < 1:
+            return None
+        bottom = (int(number) - 1) * page_size
+        return queryset[bottom:bottom + page_size]
+
+    def set_page(self, queryset, request, rows, count):
+        """Страница из уже полученных строк и числа записей."""
+        paginator = self.django_paginator_class(
+            queryset, self.get_page_size(request)
+        )
+        paginator.count = count
+        number = request.query_params.get(self.page_query_param, 1)
+        try:
+            number = paginator.validate_number(number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=number, message=str(exc)
+            ))
+        self.page = Page(rows, number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return rows
+
+
+class KeysetPagination(CursorPagination):
+    """Пагинация по составному ключу ordering без OFFSET и COUNT.
+
+    Курсор хранит значения всех полей ordering у крайней строки
+    страницы, следующая страница выбирается условием
+    (f1, f2, ...) > (v1, v2, ...). Последнее поле должно быть
+    уникальным, тогда равные значения первых полей не требуют
+    пропуска строк.
+
+    position_types - типы значений полей ordering в курсоре,
+    sorting_params - параметры запроса со своей сортировкой, которые
+    с курсором не сочетаются.
+    """
+    position_types = ()
+    sorting_params = ()
+    invalid_sorting_message = (
+        'Пагинация по курсору не сочетается с параметрами: {params}.'
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        sorting = [
+            param for param in self.sorting_params
+            if param in request.query_params
+        ]
+        if sorting:
+            raise ValidationError({'pagination': [
+                self.invalid_sorting_message.format(params=', '.join(sorting))
+            ]})
+        self.base_url = request.build_absolute_uri()
+        self.position, self.reverse = self.decode_cursor(request)
+        ordering = [
+            f'-{field}' if self.reverse else field
+            for field in self.ordering
+        ]
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.after(self.position))
+        results = list(queryset[:self.page_size + 1])
+        self.has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+        return self.page
+
+    def after(self, position, index=0):
+        """Условие «ключ строки дальше position» по порядку выдачи."""
+        field, value = self.ordering[index], position[index]
+        direction = 'lt' if self.reverse else 'gt'
+        condition = Q(**{f'{field}__{direction}': value})
+        if index + 1 < len(self.ordering):
+            condition |= Q(**{field: value}) & self.after(position, index + 1)
+        if index == 0 and len(self.ordering) > 1:
+            # Граница по первому полю позволяет читать диапазон индекса.
+            condition &= Q(**{f'{field}__{direction[0]}te': value})
+        return condition
+
+    def get_position(self, instance):
+        return [getattr(instance, field) for field in self.ordering]
+
+    def get_next_link(self):
+        if not self.page or not (
+            self.has_more if not self.reverse else self.position is not None
+        ):
+            return None
+        return self.encode_cursor((self.get_position(self.page[-1]), False))
+
+    def get_previous_link(self):
+        if not self.page or not (
+            self.has_more if self.reverse else self.position is not None
+        ):
+            return None
+        return self.encode_cursor((self.get_position(self.page[0]), True))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(b64decode(encoded.encode()))
+            position, reverse = cursor['p'], bool(cursor['r'])
+            if len(position) != len(self.ordering) or not all(
+                self.is_valid_value(value, value_type)
+                for value, value_type in zip(position, self.position_types)
+            ):
+                raise ValueError
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def is_valid_value(value, value_type):
+        """Значение поля из курсора, которое можно передать в запрос."""
+        if value_type is int:
+            return (
+                type(value) is int and BIGINT_MIN <= value <= BIGINT_MAX
+            )
+        return isinstance(value, value_type)
+
+    def encode_cursor(self, cursor):
+        position, reverse = cursor
+        encoded = b64encode(json.dumps(
+            {'p': position, 'r': int(reverse)}, ensure_ascii=False
+        ).encode()).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+
+class RecipeCursorPagination(KeysetPagination):
+    """Пагинация по ключу (name, id) без OFFSET и COUNT.
+
+    Порядок по релевантности (search) и рейтингам (ordering)
+    с курсором недоступен.
+    """
+    page_size_query_param = 'limit'
+    ordering = ('name', 'id')
+    position_types = (str, int)
+    sorting_params = ('search', 'ordering')
+
+
+class UserCursorPagination(KeysetPagination):
+    """Пагинация по ключу (username, id) без OFFSET и COUNT."""
+    page_size_query_param = 'limit'
+    ordering = ('username', 'id')
+    position_types = (str, int)
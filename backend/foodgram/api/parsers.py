@@ -0,0 +1,185 @@
+import base64
+import binascii
+import json
+import re
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+CHUNK_SIZE = 64 * 1024
+DATA_URI_MAX_LENGTH = 256
+OPEN_BRACES = (ord('{'), ord('['))
+CLOSE_BRACES = (ord('}'), ord(']'))
+QUOTE = ord('"')
+BACKSLASH = ord('\\')
+
+
+class JSONScanner:
+    """Отслеживание вложенности и строк при чтении JSON по частям."""
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.position = 0
+
+    def advance(self, data, end):
+        for byte in data[self.position:end]:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif byte == BACKSLASH:
+                    self.escape = True
+                elif byte == QUOTE:
+                    self.in_string = False
+            elif byte == QUOTE:
+                self.in_string = True
+            elif byte in OPEN_BRACES:
+                self.depth += 1
+            elif byte in CLOSE_BRACES:
+                self.depth -= 1
+        self.position = end
+
+
+class StreamingImageJSONParser(JSONParser):
+    """JSON, в котором картинка в base64 сразу декодируется во временный файл.
+
+    Тело запроса читается частями: остальной JSON накапливается в памяти
+    (не больше DATA_UPLOAD_MAX_MEMORY_SIZE), а значение поля image
+    декодируется на диск и ограничено RECIPE_IMAGE_MAX_SIZE.
+    """
+    field_name = 'image'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return super().parse(stream, media_type, parser_context)
+        self.key_pattern = re.compile(
+            rb'"' + self.field_name.encode() + rb'"\s*:\s*"'
+        )
+        self.stream = stream
+        self.buffer = bytearray()
+        image = self.read_until_image()
+        try:
+            self.read_rest()
+            data = json.loads(self.buffer.decode(settings.DEFAULT_CHARSET))
+        except (ParseError, ValueError) as error:
+            if image is not None:
+                image.close()
+            if isinstance(error, ParseError):
+                raise
+            raise ParseError(f'JSON parse error - {error}')
+        if image is not None:
+            if isinstance(data, dict) and data.get(self.field_name) == '':
+                data[self.field_name] = image
+                self.close_with_request(image, parser_context)
+            else:
+                image.close()
+        return data
+
+    def close_with_request(self, image, parser_context):
+        """Закрытие временного файла по окончании запроса.
+
+        Django закрывает файлы из request.FILES после ответа, в том числе
+        перенесённые хранилищем и не прошедшие валидацию, поэтому
+        картинка добавляется туда же.
+        """
+        request = (parser_context or {}).get('request')
+        if request is not None:
+            request._request.FILES.appendlist(self.field_name, image)
+
+    def read_chunk(self):
+        return self.stream.read(CHUNK_SIZE)
+
+    def append(self, chunk):
+        self.buffer += chunk
+        limit = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        if limit is not None and len(self.buffer) > limit:
+            raise ParseError('Слишком большой запрос.')
+
+    def read_until_image(self):
+        """Чтение JSON до значения картинки и её декодирование."""
+        scanner = JSONScanner()
+        search_from = 0
+        while True:
+            match = self.key_pattern.search(self.buffer, search_from)
+            while match is not None:
+                scanner.advance(self.buffer, match.start())
+                if not scanner.in_string and scanner.depth == 1:
+                    return self.read_image(match.end())
+                search_from = match.start() + 1
+                match = self.key_pattern.search(self.buffer, search_from)
+            chunk = self.read_chunk()
+            if not chunk:
+                return None
+            search_from = max(scanner.position, len(self.buffer) - 64)
+            self.append(chunk)
+
+    def read_image(self, value_start):
+        """Декодирование data URI картинки во временный файл."""
+        tail = bytes(self.buffer[value_start:])
+        del self.buffer[value_start:]
+        while b',' not in tail[:DATA_URI_MAX_LENGTH]:
+            chunk = None
+            if len(tail) <= DATA_URI_MAX_LENGTH:
+                chunk = self.read_chunk()
+            if not chunk:
+                self.append(tail)
+                return None
+            tail += chunk
+        header, tail = tail.split(b',', 1)
+        match = re.fullmatch(
+            rb'data:image\\?/([\w.+-]+);base64', header
+        )
+        if match is None:
+            self.append(header + b',' + tail)
+            return None
+        extension = match.group(1).decode()
+        image = TemporaryUploadedFile(
+            f'{uuid.uuid4()}.{extension}', f'image/{extension}', 0, None
+        )
+        try:
+            self.decode_image(tail, image)
+        except Exception:
+            image.close()
+            raise
+        return image
+
+    def decode_image(self, data, image):
+        size = 0
+        remainder = b''
+        while True:
+            end = data.find(b'"')
+            encoded = remainder + (data if end == -1 else data[:end])
+            encoded = encoded.replace(b'\\', b'')
+            usable = len(encoded) - len(encoded) % 4
+            try:
+                decoded = base64.b64decode(encoded[:usable], validate=True)
+            except binascii.Error:
+                raise ParseError('Некорректная картинка в base64.')
+            remainder = encoded[usable:]
+            size += len(decoded)
+            if size > settings.RECIPE_IMAGE_MAX_SIZE:
+                raise ParseError(
+                    f'Размер картинки не должен превышать '
+                    f'{settings.RECIPE_IMAGE_MAX_SIZE // (1024 * 1024)} МБ.'
+                )
+            image.write(decoded)
+            if end != -1:
+                break
+            data = self.read_chunk()
+            if not data:
+                raise ParseError('JSON parse error - unterminated string')
+        if remainder:
+            raise ParseError('Некорректная картинка в base64.')
+        image.size = size
+        image.seek(0)
+        self.append(data[end:])
+
+    def read_rest(self):
+        while True:
+            chunk = self.read_chunk()
+            if not chunk:
+                return
+            self.append(chunk)
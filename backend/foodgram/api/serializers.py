@@ -1,14 +1,52 @@
+from concurrent import futures
+
+from django.conf import settings
 from django.db import transaction
-from django.shortcuts import get_object_or_404
 from djoser.serializers import UserSerializer
 from drf_base64.fields import Base64ImageField
 from rest_framework import serializers, validators
 
+from recipes.counters import change_counter
+from recipes.images import delete_variants, run_in_pool, schedule_variants
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            RecipeScore, ShoppingCart, ShoppingListItem, Tag)
 from users.models import Subscription, User
 
 
+class RecipeImageField(Base64ImageField):
+    """Картинка в base64, декодируется в ограниченном пуле потоков."""
+    def to_internal_value(self, data):
+        try:
+            return run_in_pool(super().to_internal_value, data)
+        except futures.TimeoutError:
+            raise serializers.ValidationError(
+                'Не удалось обработать картинку, попробуйте позже.'
+            )
+
+
+class ImageVariantsField(serializers.Field):
+    """Ссылки на уменьшенные копии картинки рецепта.
+
+    Пока копии не созданы, вместо них отдаётся исходная картинка.
+    """
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        request = self.context.get('request')
+        variants = {}
+        for variant in settings.IMAGE_VARIANTS:
+            name = recipe.image_variants.get(variant)
+            url = (recipe.image.storage.url(name) if name
+                   else recipe.image.url)
+            variants[variant] = (
+                request.build_absolute_uri(url) if request else url
+            )
+        return variants
+
+
 class UserSerializer(UserSerializer):
     """Информацией о пользователях."""
     is_subscribed = serializers.SerializerMethodField()
@@ -20,15 +58,16 @@ class UserSerializer(UserSerializer):
 
     def get_is_subscribed(self, author):
         user = self.context['request'].user
+        if not user.is_authenticated:
+            return False
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         return user.follower.filter(author=author).exists()
 
 
 class UserSubscribeRepresentSerializer(UserSerializer):
     """"Предоставление информации о подписках пользователя."""
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        source='recipes.count', read_only=True
-    )
 
     class Meta:
         model = User
@@ -37,12 +76,15 @@ class UserSubscribeRepresentSerializer(UserSerializer):
         read_only_fields = ('email', 'username', 'first_name', 'last_name',
                             'is_subscribed', 'recipes', 'recipes_count')
 
-    def get_recipes(self, obj):
+    def get_recipes(self, author):
         request = self.context['request']
-        recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit:
-            recipes = obj.recipes.all()[:int(recipes_limit)]
-        recipes = obj.recipes.all()
+        if hasattr(author, 'limited_recipes'):
+            recipes = author.limited_recipes
+        else:
+            recipes = author.recipes.all()
+            recipes_limit = request.query_params.get('recipes_limit')
+            if recipes_limit and recipes_limit.isdigit():
+                recipes = recipes[:int(recipes_limit)]
         return RecipeSmallSerializer(
             recipes, many=True, context={'request': request}
         ).data
@@ -110,27 +152,38 @@ class RecipeGetSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart', 'name',
-                  'image', 'text', 'cooking_time')
+                  'image', 'image_variants', 'text', 'cooking_time')
 
     def get_is_favorited(self, recipe):
         user = self.context['request'].user
+        if not user.is_authenticated:
+            return False
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
         return user.favorites.filter(recipe=recipe).exists()
 
     def get_is_in_shopping_cart(self, recipe):
         user = self.context['request'].user
+        if not user.is_authenticated:
+            return False
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         return user.carts.filter(recipe=recipe).exists()
 
 
 class RecipeSmallSerializer(serializers.ModelSerializer):
     """Краткая информация о рецепте."""
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
@@ -142,7 +195,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         queryset=Tag.objects.all(),
         many=True
     )
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
@@ -161,6 +214,15 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Вы пытаетесь добавить в рецепт два одинаковых ингредиента'
             )
+        found = Ingredient.objects.in_bulk(ingredients)
+        missing = [pk for pk in ingredients if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: '
+                f'{", ".join(str(pk) for pk in missing)}'
+            )
+        for ingredient in data.get('recipeingredients'):
+            ingredient['ingredient'] = found[ingredient.get('id')]
         return data
 
     @staticmethod
@@ -168,18 +230,54 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         """Функция добавления ингредиентов
         при создании/редактировании рецепта.
         """
-        ingredients = []
-        for ingredient in new_ingredients:
-            current_ingredient = get_object_or_404(
-                Ingredient, id=ingredient.get('id')
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredient.get('ingredient'),
+                amount=ingredient.get('amount')
             )
-            amount = ingredient.get('amount')
-            ingredients.append(
-                RecipeIngredient(
-                    recipe=recipe, ingredient=current_ingredient, amount=amount
+            for ingredient in new_ingredients
+        )
+
+    def update_ingredients(self, new_ingredients, recipe):
+        """Приведение ингредиентов рецепта к новому составу.
+
+        Запросы выполняются только для добавленных, изменённых
+        и удалённых строк. Возвращает изменения количеств
+        для списков покупок.
+        """
+        current = {}
+        deltas = {}
+        to_create, to_update, to_delete = [], [], []
+        for item in recipe.recipeingredients.all():
+            if item.ingredient_id in current:
+                to_delete.append(item.pk)
+                deltas[item.ingredient_id] = (
+                    deltas.get(item.ingredient_id, 0) - item.amount
                 )
-            )
-        RecipeIngredient.objects.bulk_create(ingredients)
+            else:
+                current[item.ingredient_id] = item
+        for ingredient in new_ingredients:
+            ingredient_id = ingredient.get('id')
+            amount = ingredient.get('amount')
+            item = current.pop(ingredient_id, None)
+            if item is None:
+                to_create.append(ingredient)
+                delta = amount
+            else:
+                delta = amount - item.amount
+                if delta:
+                    item.amount = amount
+                    to_update.append(item)
+            deltas[ingredient_id] = deltas.get(ingredient_id, 0) + delta
+        for ingredient_id, item in current.items():
+            to_delete.append(item.pk)
+            deltas[ingredient_id] = deltas.get(ingredient_id, 0) - item.amount
+        if to_delete:
+            RecipeIngredient.objects.filter(pk__in=to_delete).delete()
+        RecipeIngredient.objects.bulk_update(to_update, ('amount', ))
+        self.create_ingredients(to_create, recipe)
+        return deltas
 
     @transaction.atomic
     def create(self, validated_data):
@@ -187,22 +285,35 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('recipeingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(author=request.user, **validated_data)
+        change_counter(User, request.user.pk, 'recipes_count', 1)
+        RecipeScore.objects.create(recipe=recipe)
         recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
+        Recipe.objects.filter(pk=recipe.pk).update_search_vector()
+        schedule_variants(recipe.pk)
         return recipe
 
     @transaction.atomic
     def update(self, recipe, validated_data):
         ingredients = validated_data.pop('recipeingredients')
         tags = validated_data.pop('tags')
-        recipe.tags.clear()
         recipe.tags.set(tags)
-        recipe.ingredients.clear()
-        self.create_ingredients(ingredients, recipe)
-        return super().update(recipe, validated_data)
+        deltas = self.update_ingredients(ingredients, recipe)
+        ShoppingListItem.objects.update_recipe(recipe.pk, deltas)
+        if 'image' in validated_data:
+            # Копии прежней картинки не показываются и удаляются.
+            delete_variants(list(recipe.image_variants.values()))
+            validated_data['image_variants'] = {}
+            schedule_variants(recipe.pk)
+        recipe = super().update(recipe, validated_data)
+        Recipe.objects.filter(pk=recipe.pk).update_search_vector()
+        return recipe
 
     def to_representation(self, instance):
         request = self.context['request']
+        instance = Recipe.objects.with_related_data(
+            request.user
+        ).get(pk=instance.pk)
         return RecipeGetSerializer(
             instance, context={'request': request}
         ).data
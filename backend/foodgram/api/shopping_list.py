@@ -0,0 +1,100 @@
+import csv
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+TITLE = 'Список покупок'
+
+
+class Echo:
+    """Псевдобуфер: возвращает записанную строку вместо её хранения."""
+    def write(self, value):
+        return value
+
+
+class TxtShoppingListRenderer:
+    """Выгрузка списка покупок в текстовом формате."""
+    content_type = 'text/plain; charset=utf-8'
+    extension = 'txt'
+    max_rows = None
+
+    def render(self, ingredients):
+        yield f'{TITLE}:\n'
+        for name, unit, amount in ingredients:
+            yield f'\n{name} - {amount}, {unit}'
+
+
+class CsvShoppingListRenderer:
+    """Выгрузка списка покупок в формате CSV."""
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+    max_rows = None
+
+    def render(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('Ингредиент', 'Количество', 'Единица'))
+        for name, unit, amount in ingredients:
+            yield writer.writerow((name, amount, unit))
+
+
+class PdfShoppingListRenderer:
+    """Выгрузка списка покупок в формате PDF.
+
+    reportlab держит страницы в памяти до сохранения документа, поэтому
+    PDF собирается целиком и только потом отдаётся частями по CHUNK_SIZE
+    байт. Чтобы память процесса оставалась ограниченной, число строк
+    не больше max_rows (SHOPPING_LIST_PDF_MAX_ROWS); длинные списки
+    выгружаются в txt или csv, которые передаются потоком.
+    """
+    content_type = 'application/pdf'
+    extension = 'pdf'
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    line_height = 18
+    margin = 50
+    CHUNK_SIZE = 64 * 1024
+
+    @property
+    def max_rows(self):
+        return settings.SHOPPING_LIST_PDF_MAX_ROWS
+
+    def register_font(self):
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_PDF_FONT)
+            )
+
+    def render(self, ingredients):
+        self.register_font()
+        buffer = BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        pdf.setTitle(TITLE)
+        width, height = A4
+        pdf.setFont(self.font_name, self.font_size + 4)
+        pdf.drawString(self.margin, height - self.margin, TITLE)
+        y = height - self.margin - 2 * self.line_height
+        pdf.setFont(self.font_name, self.font_size)
+        for name, unit, amount in ingredients:
+            if y < self.margin:
+                pdf.showPage()
+                pdf.setFont(self.font_name, self.font_size)
+                y = height - self.margin
+            pdf.drawString(self.margin, y, f'{name} - {amount}, {unit}')
+            y -= self.line_height
+        pdf.save()
+        buffer.seek(0)
+        yield from iter(lambda: buffer.read(self.CHUNK_SIZE), b'')
+
+
+SHOPPING_LIST_RENDERERS = {
+    renderer.extension: renderer
+    for renderer in (
+        TxtShoppingListRenderer,
+        CsvShoppingListRenderer,
+        PdfShoppingListRenderer,
+    )
+}
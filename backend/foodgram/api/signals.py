@@ -0,0 +1,63 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_token
+from api.cache import (INGREDIENTS_VERSION, TAGS_VERSION, USERS_VERSION,
+                       bump_version)
+from api.metrics import record_connection, record_query
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    bump_version(TAGS_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    bump_version(INGREDIENTS_VERSION)
+
+
+@receiver(post_save, sender=Ingredient)
+def update_recipes_search_vector(instance, created, **kwargs):
+    if not created:
+        Recipe.objects.filter(
+            ingredients=instance
+        ).update_search_vector()
+
+
+def is_login(update_fields):
+    """Сохранение только last_login при входе не меняет ответы API."""
+    return update_fields is not None and set(update_fields) == {'last_login'}
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_users(update_fields=None, **kwargs):
+    if not is_login(update_fields):
+        bump_version(USERS_VERSION)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(instance, created, update_fields=None,
+                           **kwargs):
+    if created or is_login(update_fields):
+        return
+    for key in Token.objects.filter(
+        user=instance
+    ).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+@receiver(connection_created)
+def install_query_metrics(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+    record_connection(connection)
@@ -0,0 +1,51 @@
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache_key
+from api.tests.test_recipe_queries import TEST_CACHES
+from users.models import User
+
+
+@override_settings(CACHES=TEST_CACHES, REQUEST_METRICS_ENABLED=False)
+class CachedTokenAuthenticationTest(TestCase):
+    def setUp(self):
+        user = User.objects.create(
+            email='user@example.com', username='user',
+            first_name='Имя', last_name='Фамилия',
+        )
+        self.token = Token.objects.create(user=user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_is_kept_in_tokens_cache(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        cache_key = token_cache_key(self.token.key)
+        self.assertIsNotNone(caches['tokens'].get(cache_key))
+        self.assertIsNone(cache.get(cache_key))
+
+    def test_logout_invalidates_token(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        self.assertEqual(
+            self.client.post('/api/auth/token/logout/').status_code, 204
+        )
+        self.assertIsNone(
+            caches['tokens'].get(token_cache_key(self.token.key))
+        )
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_cache_keeps_no_user_fields(self):
+        self.client.get('/api/users/me/')
+        self.assertEqual(
+            caches['tokens'].get(token_cache_key(self.token.key)),
+            (self.token.user_id, True, self.token.key),
+        )
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.data['email'], 'user@example.com')
+        self.assertEqual(response.data['username'], 'user')
+
+    def test_inactive_user(self):
+        self.token.user.is_active = False
+        self.token.user.save()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
@@ -0,0 +1,73 @@
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.cache import USERS_VERSION, get_version, user_version
+from api.tests.test_recipe_queries import TEST_CACHES
+from recipes.models import Recipe
+from users.models import User
+
+
+@override_settings(CACHES=TEST_CACHES, REQUEST_METRICS_ENABLED=False)
+class RecipeConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = (
+            User.objects.create(
+                email=f'{username}@example.com', username=username,
+                first_name='Имя', last_name='Фамилия',
+            )
+            for username in ('author', 'reader')
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Суп', text='Описание',
+            cooking_time=10, image='recipes/test.png',
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_invalid_pk(self):
+        self.assertEqual(
+            APIClient().get('/api/recipes/abc/').status_code, 404
+        )
+
+    def test_etag_per_user(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        author = self.client_for(self.author)
+        etag = author.get(url)['ETag']
+        self.assertEqual(
+            author.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        response = self.client_for(self.reader).get(
+            url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_user_version_bumped_on_commit(self):
+        version = get_version(user_version(self.reader.pk))
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client_for(self.reader).post(
+                f'/api/recipes/{self.recipe.pk}/favorite/'
+            )
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(
+                get_version(user_version(self.reader.pk)), version
+            )
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            get_version(user_version(self.reader.pk)), version + 1
+        )
+
+    def test_login_keeps_users_version(self):
+        version = get_version(USERS_VERSION)
+        self.reader.last_login = timezone.now()
+        self.reader.save(update_fields=('last_login', ))
+        self.assertEqual(get_version(USERS_VERSION), version)
+        self.reader.first_name = 'Другое'
+        self.reader.save()
+        self.assertEqual(get_version(USERS_VERSION), version + 1)
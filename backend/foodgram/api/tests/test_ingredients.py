@@ -0,0 +1,36 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.tests.test_recipe_queries import TEST_CACHES
+from recipes.models import Ingredient
+
+NAMES = ('морская соль', 'соль', 'солод', 'фасоль', 'сок', 'сахар')
+
+
+@override_settings(
+    CACHES=TEST_CACHES, REQUEST_METRICS_ENABLED=False,
+    INGREDIENTS_SEARCH_LIMIT=3,
+)
+class IngredientAutocompleteTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г') for name in NAMES
+        )
+
+    def search(self, value):
+        response = APIClient().get('/api/ingredients/', {'name': value})
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_prefix_before_infix(self):
+        self.assertEqual(
+            self.search('сол'), ['солод', 'соль', 'морская соль']
+        )
+
+    def test_limit(self):
+        self.assertEqual(self.search('с'), ['сахар', 'сок', 'солод'])
+
+    def test_short_value_without_infix(self):
+        self.assertEqual(self.search('ас'), [])
+        self.assertEqual(self.search('асо'), ['фасоль'])
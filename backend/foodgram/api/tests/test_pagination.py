@@ -0,0 +1,81 @@
+import json
+from base64 import b64encode
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.tests.test_recipe_queries import TEST_CACHES
+from recipes.models import Recipe
+from users.models import User
+
+
+@override_settings(CACHES=TEST_CACHES, REQUEST_METRICS_ENABLED=False)
+class RecipeCursorPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            email='author@example.com', username='author',
+            first_name='Имя', last_name='Фамилия',
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author, name=name, text='Описание',
+                cooking_time=10, image='recipes/test.png',
+            )
+            for name in ['Борщ'] * 2 + ['Суп'] * 7 + ['Каша'] * 3
+        )
+        cls.expected = list(
+            Recipe.objects.order_by('name', 'id').values_list('id', flat=True)
+        )
+
+    def pages(self, url, link):
+        client = APIClient()
+        ids = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                data = client.get(url).data
+            self.assertFalse(any(
+                'OFFSET' in query['sql'] or 'COUNT(' in query['sql']
+                for query in queries
+            ))
+            self.assertLessEqual(len(data['results']), 2)
+            ids.append([recipe['id'] for recipe in data['results']])
+            url = data[link]
+        return ids
+
+    def test_duplicate_names(self):
+        forward = self.pages('/api/recipes/?pagination=cursor&limit=2', 'next')
+        self.assertEqual(sum(forward, []), self.expected)
+        data = APIClient().get(
+            '/api/recipes/?pagination=cursor&limit=2'
+        ).data
+        while data['next']:
+            last = data
+            data = APIClient().get(data['next']).data
+        backward = self.pages(last['next'], 'previous')
+        self.assertEqual(backward[::-1], forward)
+
+    def test_invalid_cursor(self):
+        response = APIClient().get('/api/recipes/?cursor=abc')
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_with_wrong_types(self):
+        for position in ([1, 'abc'], ['Суп', 'abc'], ['Суп', 2 ** 70],
+                         ['Суп', True], 'Суп'):
+            cursor = b64encode(
+                json.dumps({'p': position, 'r': 0}).encode()
+            ).decode()
+            response = APIClient().get(
+                '/api/recipes/', {'cursor': cursor}
+            )
+            self.assertEqual(response.status_code, 404, position)
+
+    def test_cursor_with_sorting(self):
+        for params in ({'search': 'суп'}, {'ordering': 'popular'}):
+            response = APIClient().get(
+                '/api/recipes/', {'pagination': 'cursor', **params}
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('pagination', response.data)
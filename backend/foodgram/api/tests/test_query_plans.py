@@ -0,0 +1,175 @@
+import json
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.filters import IngredientFilter, RecipeFilter
+from api.tests.test_recipe_queries import TEST_CACHES
+from api.views import RecipeViewSet, UserViewSet
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+PAGE_SIZE = 6
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN для PostgreSQL')
+@override_settings(CACHES=TEST_CACHES, REQUEST_METRICS_ENABLED=False)
+class QueryPlansTest(TestCase):
+    """Запросы фильтров API не читают таблицы целиком.
+
+    В тестовой базе мало строк, поэтому последовательное чтение
+    запрещено (enable_seqscan = off): Seq Scan в плане остаётся,
+    только если подходящего индекса нет.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            User(
+                email=f'author{index}@example.com',
+                username=f'author{index}',
+                first_name='Имя', last_name='Фамилия',
+            )
+            for index in range(3)
+        )
+        cls.authors = list(User.objects.order_by('pk'))
+        cls.user = User.objects.create(
+            email='reader@example.com', username='reader',
+            first_name='Имя', last_name='Фамилия',
+        )
+        Tag.objects.bulk_create(
+            Tag(name=f'Тег {index}', color=f'#00000{index}',
+                slug=f'tag{index}')
+            for index in range(3)
+        )
+        tags = list(Tag.objects.order_by('pk'))
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('соль', 'морская соль', 'сахар', 'мука')
+        )
+        ingredients = list(Ingredient.objects.order_by('pk'))
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=cls.authors[index % len(cls.authors)],
+                name=f'Суп {index}', text='Описание',
+                cooking_time=10, image='recipes/test.png',
+            )
+            for index in range(12)
+        )
+        recipes = list(Recipe.objects.order_by('pk'))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tags[index % len(tags)])
+            for index, recipe in enumerate(recipes)
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredients[index % len(ingredients)],
+                amount=100,
+            )
+            for index, recipe in enumerate(recipes)
+        )
+        Subscription.objects.bulk_create(
+            Subscription(user=cls.user, author=author)
+            for author in cls.authors
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe) for recipe in recipes[::3]
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe=recipe)
+            for recipe in recipes[::4]
+        )
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def make_request(self, params=None):
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = self.user
+        return request
+
+    def make_view(self, view_class, params=None):
+        view = view_class()
+        view.request = self.make_request(params)
+        view.format_kwarg = None
+        return view
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return sql, list(plan_nodes(plan[0]['Plan']))
+
+    def assertNoSeqScan(self, queryset):
+        sql, nodes = self.explain(queryset)
+        scans = [
+            node['Relation Name']
+            for node in nodes if node['Node Type'] == 'Seq Scan'
+        ]
+        self.assertEqual(scans, [], sql)
+
+    def assertIndexCond(self, queryset, index_name):
+        """Условие запроса проверяется индексом, а не фильтром строк."""
+        sql, nodes = self.explain(queryset)
+        self.assertTrue(any(
+            node.get('Index Name') == index_name and 'Index Cond' in node
+            for node in nodes
+        ), sql)
+
+    def test_recipe_filters(self):
+        author = self.authors[0].pk
+        for params in (
+            {},
+            {'tags': ['tag0', 'tag1']},
+            {'author': author},
+            {'is_favorited': '1'},
+            {'is_in_shopping_cart': '1'},
+            {'search': 'суп'},
+            {'ordering': 'popular'},
+            {'ordering': 'trending'},
+            {'tags': ['tag0'], 'author': author},
+        ):
+            with self.subTest(**params):
+                request = self.make_request(params)
+                recipe_filter = RecipeFilter(
+                    request.query_params,
+                    queryset=Recipe.objects.with_related_data(self.user),
+                    request=request,
+                )
+                self.assertTrue(recipe_filter.is_valid())
+                self.assertNoSeqScan(recipe_filter.qs[:PAGE_SIZE])
+
+    def test_ingredient_prefix(self):
+        self.assertIndexCond(IngredientFilter.prefix_matches(
+            Ingredient.objects.all(), 'сол'
+        )[:PAGE_SIZE], 'recipes_ingredient_name_upper_c')
+
+    def test_ingredient_infix(self):
+        self.assertIndexCond(IngredientFilter.infix_matches(
+            Ingredient.objects.all(), 'сол', [1]
+        )[:PAGE_SIZE], 'recipes_ingredient_name_upper_trgm')
+
+    def test_subscriptions(self):
+        view = self.make_view(UserViewSet, {'recipes_limit': '3'})
+        self.assertNoSeqScan(view.get_subscriptions_queryset()[:PAGE_SIZE])
+        self.assertNoSeqScan(Recipe.objects.filter(
+            author__in=self.authors
+        ).limited_per_author(3))
+
+    def test_shopping_list(self):
+        view = self.make_view(RecipeViewSet)
+        self.assertNoSeqScan(view.get_shopping_list())
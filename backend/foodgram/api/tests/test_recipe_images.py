@@ -0,0 +1,98 @@
+import base64
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.tests.test_recipe_queries import TEST_CACHES
+from recipes.images import generate_variants
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def png(color):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 30), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(
+    CACHES=TEST_CACHES, REQUEST_METRICS_ENABLED=False, MEDIA_ROOT=MEDIA_ROOT
+)
+class RecipeImageVariantsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create(
+            email='author@example.com', username='author',
+            first_name='Имя', last_name='Фамилия',
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Суп', text='Описание', cooking_time=10,
+            image=default_storage.save(
+                'recipes/soup.png', ContentFile(png('red'))
+            ),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def test_variants_change_etag(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(
+            response.data['image_variants']['card'], response.data['image']
+        )
+        generate_variants(self.recipe.pk)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(
+            response.data['image_variants']['card'], response.data['image']
+        )
+
+    def test_new_image_drops_old_variants(self):
+        old_variants = generate_variants(self.recipe.pk).values()
+        tag = Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+        ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+        image = base64.b64encode(png('blue')).decode()
+        with mock.patch('api.serializers.schedule_variants'):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(self.url, {
+                    'ingredients': [{'id': ingredient.pk, 'amount': 5}],
+                    'tags': [tag.pk], 'name': 'Суп', 'text': 'Описание',
+                    'cooking_time': 10,
+                    'image': f'data:image/png;base64,{image}',
+                }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
+        self.assertEqual(
+            response.data['image_variants']['card'], response.data['image']
+        )
+        for name in old_variants:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_invalid_recipe_closes_upload(self):
+        upload_dir = tempfile.mkdtemp(dir=MEDIA_ROOT)
+        image = base64.b64encode(png('green')).decode()
+        with override_settings(FILE_UPLOAD_TEMP_DIR=upload_dir):
+            response = self.client.post('/api/recipes/', {
+                'name': 'Без ингредиентов',
+                'image': f'data:image/png;base64,{image}',
+            }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(os.listdir(upload_dir), [])
@@ -0,0 +1,112 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tokens',
+    },
+}
+# COUNT, страница, ETag, авторы, теги, ингредиенты.
+LIST_QUERIES = 6
+
+
+@override_settings(CACHES=TEST_CACHES, REQUEST_METRICS_ENABLED=False)
+class RecipeListQueriesTest(TestCase):
+    """Число запросов ленты рецептов не зависит от размера страницы."""
+    page_sizes = (6, 50, 500)
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            User(
+                email=f'author{index}@example.com',
+                username=f'author{index}',
+                first_name='Имя', last_name='Фамилия',
+            )
+            for index in range(10)
+        )
+        authors = list(User.objects.order_by('pk'))
+        cls.user = User.objects.create(
+            email='reader@example.com', username='reader',
+            first_name='Имя', last_name='Фамилия',
+        )
+        Tag.objects.bulk_create(
+            Tag(name=f'Тег {index}', color=f'#00000{index}',
+                slug=f'tag{index}')
+            for index in range(3)
+        )
+        tags = list(Tag.objects.order_by('pk'))
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(20)
+        )
+        ingredients = list(Ingredient.objects.order_by('pk'))
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=authors[index % len(authors)],
+                name=f'Рецепт {index:03}', text='Описание',
+                cooking_time=10, image='recipes/test.png',
+            )
+            for index in range(max(cls.page_sizes))
+        )
+        recipes = list(Recipe.objects.order_by('pk'))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for index, recipe in enumerate(recipes)
+            for tag in tags[:index % len(tags) + 1]
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredients[(index + shift) % len(ingredients)],
+                amount=100,
+            )
+            for index, recipe in enumerate(recipes)
+            for shift in range(3)
+        )
+        Subscription.objects.bulk_create(
+            Subscription(user=cls.user, author=author)
+            for author in authors[:3]
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe) for recipe in recipes[::7]
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe=recipe)
+            for recipe in recipes[::11]
+        )
+
+    def assert_list_queries(self, client):
+        for page_size in self.page_sizes:
+            with self.subTest(page_size=page_size):
+                with self.assertNumQueries(LIST_QUERIES):
+                    response = client.get(
+                        '/api/recipes/', {'limit': page_size}
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), page_size)
+
+    def test_anonymous_list(self):
+        self.assert_list_queries(APIClient())
+
+    def test_authenticated_list(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assert_list_queries(client)
+        response = client.get('/api/recipes/', {'limit': 500})
+        results = response.data['results']
+        self.assertTrue(any(recipe['is_favorited'] for recipe in results))
+        self.assertTrue(
+            any(recipe['is_in_shopping_cart'] for recipe in results)
+        )
+        self.assertTrue(
+            any(recipe['author']['is_subscribed'] for recipe in results)
+        )
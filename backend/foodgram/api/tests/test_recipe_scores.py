@@ -0,0 +1,62 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.tests.test_recipe_queries import TEST_CACHES
+from recipes.models import Recipe, RecipeScore
+from users.models import User
+
+
+@override_settings(CACHES=TEST_CACHES, REQUEST_METRICS_ENABLED=False)
+class RefreshRecipeScoresTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create(
+                email=f'user{index}@example.com', username=f'user{index}',
+                first_name='Имя', last_name='Фамилия',
+            )
+            for index in range(3)
+        ]
+        cls.recipe = Recipe.objects.create(
+            author=cls.users[0], name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/test.png',
+        )
+        RecipeScore.objects.create(recipe=cls.recipe)
+
+    def favorite(self, user, method):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = getattr(client, method)(
+            f'/api/recipes/{self.recipe.pk}/favorite/'
+        )
+        self.assertIn(response.status_code, (201, 204))
+
+    def refresh(self):
+        call_command('refresh_recipe_scores', stdout=StringIO())
+        return RecipeScore.objects.get(recipe=self.recipe)
+
+    def test_replaced_favorite_is_refreshed(self):
+        self.favorite(self.users[1], 'post')
+        score = self.refresh()
+        self.assertEqual(score.favorites_count, 1)
+        self.favorite(self.users[1], 'delete')
+        self.favorite(self.users[2], 'post')
+        refreshed = self.refresh()
+        self.assertEqual(refreshed.favorites_count, 1)
+        self.assertGreater(refreshed.trending, score.trending)
+        self.assertGreater(refreshed.updated_at, score.updated_at)
+
+    def test_removed_favorite_is_refreshed(self):
+        self.favorite(self.users[1], 'post')
+        self.refresh()
+        self.favorite(self.users[1], 'delete')
+        score = self.refresh()
+        self.assertEqual((score.favorites_count, score.trending), (0, 0))
+
+    def test_unchanged_recipe_is_skipped(self):
+        self.favorite(self.users[1], 'post')
+        score = self.refresh()
+        self.assertEqual(self.refresh().updated_at, score.updated_at)
@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.cache import bump_version, get_version
+from api.tests.test_recipe_queries import TEST_CACHES
+from recipes.models import Tag
+
+
+@override_settings(CACHES=TEST_CACHES, REQUEST_METRICS_ENABLED=False)
+class ReferenceCacheTest(TestCase):
+    def test_concurrent_bumps_are_not_lost(self):
+        version = get_version('test')
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(bump_version, ['test'] * 200))
+        self.assertEqual(get_version('test'), version + 200)
+
+    def test_etag_changes_with_tags(self):
+        client = APIClient()
+        etag = client.get('/api/tags/')['ETag']
+        self.assertEqual(
+            client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag).status_code,
+            304
+        )
+        Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+        response = client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since_is_ignored(self):
+        response = APIClient().get(
+            '/api/tags/',
+            HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
@@ -0,0 +1,61 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.metrics import MetricsHistogram, histogram
+from api.models import RequestMetric
+from api.tests.test_recipe_queries import TEST_CACHES
+
+
+@override_settings(
+    CACHES=TEST_CACHES, REQUEST_METRICS_ENABLED=True,
+    REQUEST_METRICS_FLUSH_INTERVAL=0,
+)
+class RequestMetricsTest(TestCase):
+    def values(self, **extra):
+        return {
+            'total': 30, 'db': 10, 'view': 15, 'render': 5, 'connect': 0,
+            'pool_wait': 0, 'queries': 3, **extra,
+        }
+
+    def test_flushes_of_processes_add_up(self):
+        workers = [MetricsHistogram(), MetricsHistogram()]
+        for worker in workers:
+            worker.record('RecipeViewSet.list', self.values())
+            worker.record('RecipeViewSet.list', self.values(total=700))
+        workers[1].record(
+            'RecipeViewSet.list', self.values(), ['SELECT 1']
+        )
+        for worker in workers:
+            worker.flush()
+        entry = MetricsHistogram.read()['RecipeViewSet.list']
+        self.assertEqual(entry['count'], 5)
+        self.assertEqual(entry['duplicates'], 1)
+        self.assertEqual(entry['duplicate_sample'], 'SELECT 1')
+        self.assertEqual(entry['total']['p50'], 50)
+        self.assertEqual(entry['total']['p99'], 1000)
+        self.assertEqual(entry['queries']['mean'], 3)
+
+    def test_requests_are_recorded(self):
+        APIClient().get('/api/tags/')
+        histogram.flush()
+        self.assertEqual(
+            MetricsHistogram.read()['TagViewSet.list']['count'], 1
+        )
+        MetricsHistogram.reset()
+        self.assertFalse(RequestMetric.objects.exists())
+
+    @override_settings(REQUEST_METRICS_FLUSH_INTERVAL=10)
+    def test_record_leaves_flush_to_thread(self):
+        worker = MetricsHistogram()
+        with mock.patch('api.metrics.threading.Thread') as thread, \
+                mock.patch('api.metrics.atexit.register'), \
+                self.assertNumQueries(0):
+            worker.record('RecipeViewSet.list', self.values())
+            worker.record('TagViewSet.list', self.values())
+        thread.assert_called_once_with(
+            target=worker.flush_periodically, name='request-metrics',
+            daemon=True,
+        )
+        thread.return_value.start.assert_called_once_with()
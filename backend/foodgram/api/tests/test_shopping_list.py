@@ -0,0 +1,136 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.tests.test_recipe_queries import TEST_CACHES
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingListItem, Tag)
+from users.models import User
+
+
+@override_settings(CACHES=TEST_CACHES, REQUEST_METRICS_ENABLED=False)
+class ShoppingListExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email='buyer@example.com', username='buyer',
+            first_name='Имя', last_name='Фамилия',
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(5)
+        )
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(user=cls.user, ingredient=ingredient, amount=10)
+            for ingredient in Ingredient.objects.all()
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, file_type):
+        return self.client.get(
+            '/api/recipes/download_shopping_cart/', {'type': file_type}
+        )
+
+    def test_pdf(self):
+        response = self.download('pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(
+            b'%PDF'
+        ))
+
+    def test_pdf_row_limit(self):
+        with override_settings(SHOPPING_LIST_PDF_MAX_ROWS=4):
+            self.assertEqual(self.download('pdf').status_code, 400)
+        response = self.download('csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len(b''.join(response.streaming_content).splitlines()), 6
+        )
+
+
+@override_settings(CACHES=TEST_CACHES, REQUEST_METRICS_ENABLED=False)
+class ShoppingListDeltasTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.buyer = (
+            User.objects.create(
+                email=f'{name}@example.com', username=name,
+                first_name='Имя', last_name='Фамилия',
+            )
+            for name in ('author', 'buyer')
+        )
+        cls.tag = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+        cls.salt, cls.flour, cls.sugar = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'мука', 'сахар')
+        )
+        cls.bread, cls.cake = (
+            Recipe.objects.create(
+                author=cls.author, name=name, text='Описание',
+                cooking_time=10, image='recipes/test.png',
+            )
+            for name in ('Хлеб', 'Пирог')
+        )
+        RecipeIngredient.objects.bulk_create((
+            RecipeIngredient(
+                recipe=cls.bread, ingredient=cls.salt, amount=100
+            ),
+            RecipeIngredient(
+                recipe=cls.bread, ingredient=cls.flour, amount=50
+            ),
+            RecipeIngredient(recipe=cls.cake, ingredient=cls.salt, amount=30),
+        ))
+
+    def cart(self, recipe, method):
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        response = getattr(client, method)(
+            f'/api/recipes/{recipe.pk}/shopping_cart/'
+        )
+        self.assertIn(response.status_code, (201, 204))
+
+    def shopping_list(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.buyer
+        ).values_list('ingredient__name', 'amount'))
+
+    def test_cart_add_and_remove(self):
+        self.cart(self.bread, 'post')
+        self.cart(self.cake, 'post')
+        self.assertEqual(self.shopping_list(), {'соль': 130, 'мука': 50})
+        self.cart(self.bread, 'delete')
+        self.assertEqual(self.shopping_list(), {'соль': 30})
+        self.cart(self.cake, 'delete')
+        self.assertEqual(self.shopping_list(), {})
+
+    def test_recipe_edit_changes_totals(self):
+        self.cart(self.bread, 'post')
+        self.cart(self.cake, 'post')
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.patch(f'/api/recipes/{self.bread.pk}/', {
+            'ingredients': [
+                {'id': self.salt.pk, 'amount': 120},
+                {'id': self.sugar.pk, 'amount': 10},
+            ],
+            'tags': [self.tag.pk], 'name': 'Хлеб', 'text': 'Описание',
+            'cooking_time': 10,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.shopping_list(), {'соль': 150, 'сахар': 10})
+        self.assertFalse(ShoppingListItem.objects.filter(
+            user=self.author
+        ).exists())
+
+    def test_total_dropping_to_zero_removes_item(self):
+        ShoppingListItem.objects.apply_deltas(
+            [self.buyer.pk], {self.salt.pk: 20}
+        )
+        ShoppingListItem.objects.apply_deltas(
+            [self.buyer.pk], {self.salt.pk: -20, self.flour.pk: -5}
+        )
+        self.assertEqual(self.shopping_list(), {})
@@ -1,60 +1,123 @@
-from django.db.models import Sum
-from django.shortcuts import HttpResponse, get_object_or_404
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import (SAFE_METHODS, AllowAny,
+                                        IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
+from rest_framework.response import Response
 
+from api.cache import (INGREDIENTS_VERSION, SCORES_VERSION, TAGS_VERSION,
+                       USERS_VERSION, get_version, user_version)
+from api.concurrency import AsyncReadMixin, database_sync_to_async
 from api.filters import IngredientFilter, RecipeFilter
-from api.mixins import AddRemoveMixin
-from api.pagination import PageLimitPagination
+from api.mixins import (AddRemoveMixin, ConditionalGetMixin,
+                        CursorPaginationMixin, ReferenceCacheMixin)
+from api.pagination import (PageLimitPagination, RecipeCursorPagination,
+                            UserCursorPagination)
+from api.parsers import StreamingImageJSONParser
 from api.permissions import IsOwnerOrReadOnly
 from api.serializers import (FavoriteSerializer, IngredientSerializer,
                              RecipeCreateSerializer, RecipeGetSerializer,
                              ShoppingCartSerializer, TagSerialiser,
                              UserSubscribeRepresentSerializer,
                              UserSubscribeSerializer)
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+from api.shopping_list import SHOPPING_LIST_RENDERERS
+from recipes.counters import (CART_COUNTERS, FAVORITE_COUNTERS,
+                              SUBSCRIPTION_COUNTERS, change_counter)
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
 from users.models import Subscription, User
 
 
-class UserViewSet(AddRemoveMixin, DjoserUserViewSet):
+class UserViewSet(AsyncReadMixin, CursorPaginationMixin, AddRemoveMixin,
+                  DjoserUserViewSet):
     pagination_class = PageLimitPagination
+    cursor_pagination_class = UserCursorPagination
+    async_actions = ('subscriptions', )
+
+    def get_queryset(self):
+        return super().get_queryset().with_is_subscribed(self.request.user)
+
+    def get_subscriptions_queryset(self):
+        """Авторы, на которых подписан пользователь, с их рецептами."""
+        request = self.request
+        recipes = Recipe.objects.only(
+            'id', 'author', 'name', 'image', 'image_variants', 'cooking_time'
+        )
+        recipes_limit = request.query_params.get('recipes_limit')
+        if recipes_limit and recipes_limit.isdigit():
+            recipes = recipes.limited_per_author(int(recipes_limit))
+        return User.objects.filter(
+            following__user=request.user
+        ).with_is_subscribed(
+            request.user
+        ).order_by(
+            'username'
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        )
 
     @action(detail=False)
     def subscriptions(self, request):
-        queryset = User.objects.filter(following__user=request.user)
+        queryset = self.get_subscriptions_queryset()
         paginated_queryset = self.paginate_queryset(queryset)
         serializer = UserSubscribeRepresentSerializer(
             paginated_queryset, context={'request': request}, many=True
         )
         return self.get_paginated_response(serializer.data)
 
+    async def async_subscriptions(self, request):
+        page = await self.paginate_queryset_async(
+            self.get_subscriptions_queryset()
+        )
+        data = await database_sync_to_async(
+            lambda: UserSubscribeRepresentSerializer(
+                page, context={'request': request}, many=True
+            ).data
+        )()
+        return self.get_paginated_response(data)
+
     @action(detail=True, methods=['post'], url_path='subscribe')
     def subscribe(self, request, id):
         author = get_object_or_404(User, id=id)
         data = {'user': request.user.id, 'author': author.id}
-        return self.add(request, UserSubscribeSerializer, data)
+        return self.add(
+            request, UserSubscribeSerializer, data, SUBSCRIPTION_COUNTERS
+        )
 
     @subscribe.mapping.delete
     def unsubscribe(self, request, id=None):
         data = {'user': request.user.id, 'author': id}
-        return self.remove(Subscription, data)
+        return self.remove(Subscription, data, SUBSCRIPTION_COUNTERS)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(AsyncReadMixin, ReferenceCacheMixin,
+                 viewsets.ReadOnlyModelViewSet):
     """Получение информации о тегах."""
+    async_actions = ('list', 'retrieve')
+    cache_version = TAGS_VERSION
     queryset = Tag.objects.all()
     serializer_class = TagSerialiser
     permission_classes = (AllowAny, )
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(AsyncReadMixin, ReferenceCacheMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Получение информации об ингредиентах."""
+    async_actions = ('list', 'retrieve')
+    cache_version = INGREDIENTS_VERSION
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny, )
@@ -62,62 +125,211 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list':
+            return queryset[:settings.INGREDIENTS_SEARCH_LIMIT]
+        return queryset
 
-class RecipeViewSet(viewsets.ModelViewSet, AddRemoveMixin):
+
+class RecipeViewSet(AsyncReadMixin, ConditionalGetMixin,
+                    CursorPaginationMixin, viewsets.ModelViewSet,
+                    AddRemoveMixin):
     """Работа с рецептами. Создание/изменение/удаление рецепта.
     Получение информации о рецептах.
     Добавление рецептов в избранное и список покупок.
     Отправка файла со списком рецептов.
     """
-    queryset = Recipe.objects.all()
     permission_classes = (IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    cursor_pagination_class = RecipeCursorPagination
+    parser_classes = (StreamingImageJSONParser, FormParser, MultiPartParser)
     http_method_names = ['get', 'post', 'patch', 'delete']
+    async_actions = ('list', 'retrieve')
+
+    def get_queryset(self):
+        return Recipe.objects.with_related_data(self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    async def async_list(self, request, *args, **kwargs):
+        """Список рецептов: ETag, затем строки страницы и COUNT параллельно.
+
+        Страница не запрашивается, если у клиента актуальная версия.
+        """
+        etag = self.get_etag(
+            await database_sync_to_async(self.get_etag_parts)()
+        )
+        response = self.get_not_modified(request, etag)
+        if response is None:
+            queryset = await database_sync_to_async(self.filter_queryset)(
+                self.get_queryset()
+            )
+            page = await self.paginate_queryset_async(queryset)
+            response = self.get_paginated_response(
+                await self.serialize_async(page, many=True)
+            )
+        return self.set_etag(response, etag)
+
+    async def async_retrieve(self, request, *args, **kwargs):
+        etag = self.get_etag(
+            await database_sync_to_async(self.get_etag_parts)()
+        )
+        response = self.get_not_modified(request, etag)
+        if response is None:
+            recipe = await database_sync_to_async(self.get_object)()
+            response = Response(await self.serialize_async(recipe))
+        return self.set_etag(response, etag)
+
+    def get_etag_parts(self):
+        """Состояние рецептов и справочников, от которых зависит ответ."""
+        user = self.request.user
+        if isinstance(self.paginator, RecipeCursorPagination):
+            return None
+        if self.action == 'retrieve':
+            try:
+                queryset = Recipe.objects.filter(pk=self.kwargs['pk'])
+            except (TypeError, ValueError, DjangoValidationError):
+                raise Http404
+        else:
+            queryset = self.filter_queryset(self.get_queryset())
+        state = queryset.aggregate(
+            count=Count('pk'), updated_at=Max('updated_at')
+        )
+        return (
+            user.pk, state['count'], state['updated_at'],
+            get_version(TAGS_VERSION), get_version(INGREDIENTS_VERSION),
+            get_version(USERS_VERSION),
+            get_version(user_version(user.pk)) if user.is_authenticated
+            else None,
+            get_version(SCORES_VERSION)
+            if 'ordering' in self.request.query_params else None,
+        )
 
     def get_serializer_class(self):
-        if self.action in SAFE_METHODS:
+        if self.request.method in SAFE_METHODS:
             return RecipeGetSerializer
         return RecipeCreateSerializer
 
+    @transaction.atomic
+    def perform_destroy(self, recipe):
+        ShoppingListItem.objects.remove_recipe(
+            list(recipe.carts.values_list('user_id', flat=True)), recipe.pk
+        )
+        recipe.delete()
+        change_counter(User, recipe.author_id, 'recipes_count', -1)
+
     @action(detail=True, methods=['post'], url_path='favorite')
     def add_favorites(self, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
         data = {'user': request.user.id, 'recipe': recipe.pk}
-        return self.add(request, FavoriteSerializer, data)
+        return self.add(request, FavoriteSerializer, data, FAVORITE_COUNTERS)
 
     @add_favorites.mapping.delete
     def remove_favorites(self, request, pk=None):
         data = {'user': request.user.id, 'recipe': pk}
-        return self.remove(Favorite, data)
+        return self.remove(Favorite, data, FAVORITE_COUNTERS)
 
     @action(detail=True, methods=['post'], url_path='shopping_cart')
     def add_cart(self, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
         data = {'user': request.user.id, 'recipe': recipe.pk}
-        return self.add(request, ShoppingCartSerializer, data)
+        with transaction.atomic():
+            response = self.add(
+                request, ShoppingCartSerializer, data, CART_COUNTERS
+            )
+            ShoppingListItem.objects.add_recipe([request.user.id], recipe.pk)
+        return response
 
     @add_cart.mapping.delete
     def remove_cart(self, request, pk=None):
         data = {'user': request.user.id, 'recipe': pk}
-        return self.remove(ShoppingCart, data)
+        with transaction.atomic():
+            response = self.remove(ShoppingCart, data, CART_COUNTERS)
+            ShoppingListItem.objects.remove_recipe([request.user.id], pk)
+        return response
 
-    @action(detail=False, methods=['get'])
+    def get_shopping_list(self):
+        """Итоговый список покупок пользователя."""
+        return self.request.user.shopping_list.order_by(
+            'ingredient__name'
+        ).values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        )
+
+    @action(detail=False, methods=['get'],
+            permission_classes=(IsAuthenticated, ))
     def download_shopping_cart(self, request):
-        """Отправка файла со списком покупок."""
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__carts__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(ingredient_amount=Sum('amount'))
-        shopping_list = ['Список покупок:\n']
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['ingredient_amount']
-            shopping_list.append(f'\n{name} - {amount}, {unit}')
-        response = HttpResponse(shopping_list, content_type='text/plain')
+        """Отправка файла со списком покупок.
+
+        Формат выбирается параметром type: txt (по умолчанию), csv или pdf.
+        PDF собирается в памяти, поэтому его размер ограничен.
+        """
+        file_type = request.query_params.get('type', 'txt')
+        if file_type not in SHOPPING_LIST_RENDERERS:
+            raise ValidationError(
+                {'type': f'Доступные форматы: '
+                         f'{", ".join(SHOPPING_LIST_RENDERERS)}.'}
+            )
+        renderer = SHOPPING_LIST_RENDERERS[file_type]()
+        shopping_list = self.get_shopping_list()
+        if (
+            renderer.max_rows is not None
+            and shopping_list.count() > renderer.max_rows
+        ):
+            raise ValidationError(
+                {'type': f'В формате {file_type} можно выгрузить не больше '
+                         f'{renderer.max_rows} позиций, выберите txt '
+                         f'или csv.'}
+            )
+        # Django 3.2 под ASGI читает потоковый ответ в цикле событий,
+        # где ORM недоступен, поэтому там файл собирается сразу.
+        response_class = (
+            HttpResponse if isinstance(request._request, ASGIRequest)
+            else StreamingHttpResponse
+        )
+        response = response_class(
+            renderer.render(shopping_list.iterator(
+                chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE
+            )),
+            content_type=renderer.content_type
+        )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.txt"'
+            f'attachment; filename="shopping_cart.{renderer.extension}"'
         )
         return response
+
+    @action(detail=False, methods=['get'], url_path='by_ingredients')
+    def by_ingredients(self, request):
+        """Рецепты из имеющихся ингредиентов.
+
+        Ингредиенты передаются параметром ingredients: ?ingredients=1,2
+        или ?ingredients=1&ingredients=2. Рецепты упорядочены по доле
+        имеющихся ингредиентов.
+        """
+        values = [
+            value.strip()
+            for param in request.query_params.getlist('ingredients')
+            for value in param.split(',') if value.strip()
+        ]
+        if not values or not all(value.isdigit() for value in values):
+            raise ValidationError(
+                {'ingredients': 'Укажите id ингредиентов через запятую.'}
+            )
+        recipe_ids = ingredient_index.rank(int(value) for value in values)
+        paginator = PageLimitPagination()
+        page = paginator.paginate_queryset(recipe_ids, request, view=self)
+        recipes = self.get_queryset().in_bulk(page)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in page if pk in recipes], many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
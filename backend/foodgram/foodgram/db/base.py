@@ -0,0 +1,88 @@
+import threading
+from time import monotonic, perf_counter
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+
+from foodgram.db.pool import ConnectionPool
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias):
+    with pools_lock:
+        if alias not in pools:
+            pools[alias] = ConnectionPool(
+                settings.DB_POOL_SIZE, settings.DB_POOL_TIMEOUT,
+                settings.DB_HEALTH_CHECK_INTERVAL,
+                settings.DB_POOL_MAX_LIFETIME,
+            )
+        return pools[alias]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL с пулом соединений и проверкой постоянных соединений.
+
+    При DB_POOL_SIZE > 0 соединения берутся из пула процесса и
+    возвращаются в него вместо закрытия, CONN_MAX_AGE должен быть 0.
+    Иначе постоянное соединение (CONN_MAX_AGE > 0) на границе запроса
+    проверяется не чаще раза в DB_HEALTH_CHECK_INTERVAL секунд.
+    Время открытия соединения и ожидания пула сохраняется
+    в connect_time и pool_wait для метрик запроса.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if settings.DB_POOL_SIZE and self.settings_dict['CONN_MAX_AGE']:
+            raise ImproperlyConfigured(
+                'CONN_MAX_AGE must be 0 when DB_POOL_SIZE is set'
+            )
+        self.connect_time = 0
+        self.pool_wait = 0
+        self.checked_at = None
+
+    def get_new_connection(self, conn_params):
+        self.checked_at = monotonic()
+        self.connect_time = self.pool_wait = 0
+        if not settings.DB_POOL_SIZE:
+            return self.open_connection(conn_params)
+        pool = get_pool(self.alias)
+        connection, self.pool_wait = pool.acquire()
+        if connection is None:
+            try:
+                connection = self.open_connection(conn_params)
+            except BaseException:
+                pool.release(None)
+                raise
+            pool.add(connection)
+        return connection
+
+    def open_connection(self, conn_params):
+        started = perf_counter()
+        connection = super().get_new_connection(conn_params)
+        self.connect_time = perf_counter() - started
+        return connection
+
+    def _close(self):
+        if not settings.DB_POOL_SIZE:
+            return super()._close()
+        # Закрытое внутри atomic соединение остаётся у обёртки до выхода
+        # из блока, поэтому в пул оно не возвращается.
+        get_pool(self.alias).release(
+            self.connection,
+            discard=self.in_atomic_block
+            or self.errors_occurred and not self.is_usable(),
+        )
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        if (
+            self.connection is not None
+            and monotonic() - self.checked_at
+            >= settings.DB_HEALTH_CHECK_INTERVAL
+        ):
+            if self.is_usable():
+                self.checked_at = monotonic()
+            else:
+                self.close()
@@ -0,0 +1,104 @@
+import threading
+from collections import deque
+from time import monotonic, perf_counter
+
+from psycopg2 import Error, OperationalError, extensions
+
+
+def is_usable(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Error:
+        return False
+    return True
+
+
+class ConnectionPool:
+    """Соединения psycopg2, общие для всех потоков процесса.
+
+    Одновременно выдаётся не больше size соединений, остальные потоки
+    ждут свободного до timeout секунд. Соединение, простоявшее без дела
+    дольше check_interval, перед выдачей проверяется запросом SELECT 1;
+    прожившее дольше max_lifetime закрывается.
+    """
+    def __init__(self, size, timeout, check_interval, max_lifetime):
+        self.size = size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.max_lifetime = max_lifetime
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.idle = deque()
+        self.created_at = {}
+
+    def acquire(self):
+        """Свободное соединение и время ожидания слота.
+
+        Вместо соединения возвращается None, если свободных нет: тогда
+        вызывающий открывает новое в полученном слоте и передаёт его
+        в add, а при ошибке освобождает слот через release(None).
+        """
+        started = perf_counter()
+        if not self.slots.acquire(timeout=self.timeout):
+            raise OperationalError(
+                f'No free connection in the pool of {self.size} '
+                f'after {self.timeout} s'
+            )
+        wait = perf_counter() - started
+        try:
+            return self.take_idle(), wait
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def take_idle(self):
+        while True:
+            with self.lock:
+                if not self.idle:
+                    return None
+                connection, released_at = self.idle.pop()
+            now = monotonic()
+            if (
+                connection.closed
+                or now - self.created_at[connection] >= self.max_lifetime
+                or now - released_at >= self.check_interval
+                and not is_usable(connection)
+            ):
+                self.discard(connection)
+                continue
+            return connection
+
+    def add(self, connection):
+        with self.lock:
+            self.created_at[connection] = monotonic()
+
+    def release(self, connection, discard=False):
+        """Возврат соединения; незавершённая транзакция откатывается."""
+        try:
+            if connection is None:
+                return
+            if not discard and not connection.closed:
+                try:
+                    if (
+                        connection.info.transaction_status
+                        != extensions.TRANSACTION_STATUS_IDLE
+                    ):
+                        connection.rollback()
+                except Error:
+                    discard = True
+            if discard or connection.closed:
+                self.discard(connection)
+            else:
+                with self.lock:
+                    self.idle.append((connection, monotonic()))
+        finally:
+            self.slots.release()
+
+    def discard(self, connection):
+        with self.lock:
+            self.created_at.pop(connection, None)
+        try:
+            connection.close()
+        except Error:
+            pass
@@ -2,6 +2,7 @@ import os
 from distutils.util import strtobool
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -33,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,14 +67,51 @@ WSGI_APPLICATION = 'foodgram.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.postgresql'),
+        'ENGINE': os.getenv('DB_ENGINE', 'foodgram.db'),
         'NAME': os.getenv('DB_NAME', 'postgres'),
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'password'),
         'HOST': os.getenv('DB_HOST', 'db'),
-        'PORT': os.getenv('DB_PORT', '5432')
+        'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+        'DISABLE_SERVER_SIDE_CURSORS': bool(
+            strtobool(os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', 'false'))
+        ),
     }
 }
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 0))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))
+DB_POOL_MAX_LIFETIME = 60 * 60
+DB_HEALTH_CHECK_INTERVAL = int(os.getenv('DB_HEALTH_CHECK_INTERVAL', 30))
+
+
+TOKEN_CACHE_BACKEND = os.getenv(
+    'TOKEN_CACHE_BACKEND',
+    'django.core.cache.backends.filebased.FileBasedCache'
+)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', '/tmp/foodgram_cache'),
+    },
+    # Токены хранятся отдельно: вытеснение в общем кэше их не затрагивает.
+    # В production нужен общий для всех хостов сервер (memcached),
+    # иначе выход и смена пароля не удалят токен из кэша других хостов.
+    'tokens': {
+        'BACKEND': TOKEN_CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'TOKEN_CACHE_LOCATION', '/tmp/foodgram_tokens'
+        ),
+        'KEY_PREFIX': 'tokens',
+        'OPTIONS': (
+            {'MAX_ENTRIES': 100000}
+            if TOKEN_CACHE_BACKEND.endswith('.FileBasedCache') else {}
+        ),
+    },
+}
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -119,7 +158,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageLimitPagination',
     'PAGE_SIZE': 6,
@@ -149,5 +188,60 @@ SLUG_COLOR_MAX_LENGTH = 7
 MIN_TIME_AMOUNT = 1
 MAX_TIME_AMOUNT = 32767
 
+REFERENCE_CACHE_TIMEOUT = 60 * 60
+REFERENCE_LOCAL_CACHE_SIZE = 256
+
+REQUEST_METRICS_ENABLED = bool(
+    strtobool(os.getenv('REQUEST_METRICS_ENABLED', 'true'))
+)
+REQUEST_METRICS_SERVER_TIMING = bool(
+    strtobool(os.getenv('REQUEST_METRICS_SERVER_TIMING', str(DEBUG)))
+)
+REQUEST_METRICS_DUPLICATE_THRESHOLD = 5
+REQUEST_METRICS_FLUSH_INTERVAL = 10
+
+AUTH_TOKEN_CACHE_TIMEOUT = 5 * 60
+AUTH_TOKEN_LOCAL_TTL = 10
+AUTH_TOKEN_LOCAL_CACHE_SIZE = 1024
+
+INGREDIENTS_SEARCH_LIMIT = int(os.getenv('INGREDIENTS_SEARCH_LIMIT', 50))
+
+RECIPE_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+IMAGE_PROCESSING_TIMEOUT = 30
+IMAGE_VARIANT_FORMAT = os.getenv('IMAGE_VARIANT_FORMAT', 'WEBP')
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (600, 600),
+    'full': (1600, 1600),
+}
+
+SEARCH_CONFIG = 'russian'
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 5 * 60))
+
+RECIPE_TRENDING_HALF_LIFE = int(
+    os.getenv('RECIPE_TRENDING_HALF_LIFE', 3 * 24 * 60 * 60)
+)
+
+SHOPPING_LIST_CHUNK_SIZE = 500
+SHOPPING_LIST_PDF_MAX_ROWS = int(
+    os.getenv('SHOPPING_LIST_PDF_MAX_ROWS', 1000)
+)
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+ASYNC_VIEWS = bool(strtobool(os.getenv('ASYNC_VIEWS', 'false')))
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', 10))
+# Каждый переход в поток db_executor проверяет соединение на границе,
+# как запрос: без пула и CONN_MAX_AGE открывалось бы новое соединение.
+if ASYNC_VIEWS and not (DB_POOL_SIZE or DATABASES['default']['CONN_MAX_AGE']):
+    raise ImproperlyConfigured(
+        'ASYNC_VIEWS requires DB_POOL_SIZE or DB_CONN_MAX_AGE above 0'
+    )
+
 PROHIBITED_USERNAMES = ('me')
 VALID_CHARS = r'[\w.@+-]'
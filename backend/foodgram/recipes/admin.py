@@ -2,7 +2,7 @@ from django.conf import settings
 from django.contrib import admin
 
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
 
 admin.site.empty_value_display = settings.EMPTY_VALUE
 
@@ -28,14 +28,20 @@ class RecipeIngredientInline(admin.TabularInline):
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('pk', 'name', 'author', 'favorites_amount')
+    list_select_related = ('author', )
     list_filter = ('name', 'author', 'tags')
     search_fields = ('name', 'author')
     inlines = [
         RecipeIngredientInline,
     ]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Recipe.objects.filter(pk=form.instance.pk).update_search_vector()
+
+    @admin.display(description='В избранном', ordering='favorites_count')
     def favorites_amount(self, recipe):
-        return recipe.favorites.count()
+        return recipe.favorites_count
 
 
 @admin.register(RecipeIngredient)
@@ -53,3 +59,9 @@ class FavoriteAdmin(admin.ModelAdmin):
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'recipe')
     search_fields = ('user', 'recipe')
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'ingredient', 'amount')
+    search_fields = ('user__username', 'ingredient__name')
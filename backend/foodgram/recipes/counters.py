@@ -0,0 +1,45 @@
+from django.db import models
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+# Счётчик: модель, поле счётчика, модель связей и её поле со ссылкой.
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'carts_count', ShoppingCart, 'recipe'),
+    (User, 'followers_count', Subscription, 'author'),
+    (User, 'recipes_count', Recipe, 'author'),
+)
+
+# Счётчики для AddRemoveMixin: модель, ключ в data, поле счётчика.
+FAVORITE_COUNTERS = ((Recipe, 'recipe', 'favorites_count'), )
+CART_COUNTERS = ((Recipe, 'recipe', 'carts_count'), )
+SUBSCRIPTION_COUNTERS = ((User, 'author', 'followers_count'), )
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарное изменение счётчика без ухода в минус."""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: models.F(field) + delta})
+
+
+def change_counters(counters, data, delta):
+    for model, key, field in counters:
+        change_counter(model, data[key], field, delta)
+
+
+def related_count(model, field):
+    """Подзапрос с количеством связанных записей."""
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(
+                **{field: models.OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=models.Count('pk')
+            ).values('total')
+        ),
+        0
+    )
@@ -0,0 +1,98 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+from recipes.models import Recipe
+
+decode_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='image-decode'
+)
+variants_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='image-variants'
+)
+
+VARIANTS_DIR = 'recipes/variants'
+
+
+def run_in_pool(func, *args, **kwargs):
+    """Выполнение обработки картинки в ограниченном пуле потоков."""
+    return decode_executor.submit(func, *args, **kwargs).result(
+        timeout=settings.IMAGE_PROCESSING_TIMEOUT
+    )
+
+
+def variant_name(image_name, variant):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    extension = settings.IMAGE_VARIANT_FORMAT.lower()
+    return f'{VARIANTS_DIR}/{stem}_{variant}.{extension}'
+
+
+def render_variant(image, size):
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    variant.save(
+        buffer, settings.IMAGE_VARIANT_FORMAT,
+        quality=settings.IMAGE_VARIANT_QUALITY
+    )
+    return ContentFile(buffer.getvalue())
+
+
+def generate_variants(recipe_id):
+    """Создание уменьшенных копий картинки рецепта."""
+    recipe = Recipe.objects.only('image').filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return None
+    storage = recipe.image.storage
+    with recipe.image.open('rb') as file:
+        image = Image.open(file)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    if settings.IMAGE_VARIANT_FORMAT == 'JPEG':
+        image = image.convert('RGB')
+    variants = {}
+    for variant, size in settings.IMAGE_VARIANTS.items():
+        name = variant_name(recipe.image.name, variant)
+        if storage.exists(name):
+            storage.delete(name)
+        variants[variant] = storage.save(name, render_variant(image, size))
+    # updated_at меняет ETag рецепта: клиенты, получившие ссылку
+    # на оригинал, увидят копии при следующей проверке.
+    Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).update(image_variants=variants, updated_at=timezone.now())
+    return variants
+
+
+def generate_variants_in_background(recipe_id):
+    try:
+        generate_variants(recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(recipe_id):
+    """Фоновое создание копий картинки после фиксации транзакции."""
+    transaction.on_commit(
+        lambda: variants_executor.submit(
+            generate_variants_in_background, recipe_id
+        )
+    )
+
+
+def delete_variants(names):
+    """Удаление файлов копий после фиксации транзакции."""
+    storage = Recipe._meta.get_field('image').storage
+
+    def delete():
+        for name in names:
+            storage.delete(name)
+
+    transaction.on_commit(delete)
@@ -0,0 +1,87 @@
+import threading
+from itertools import chain
+from time import monotonic
+
+import numpy as np
+from django.conf import settings
+
+from recipes.models import RecipeIngredient
+
+ROWS_CHUNK_SIZE = 10000
+
+
+class IngredientIndex:
+    """Обратный индекс: ингредиент -> отсортированный массив id рецептов.
+
+    Строится в памяти процесса по RecipeIngredient и перестраивается
+    не чаще раза в INGREDIENT_INDEX_TTL секунд при очередном запросе.
+    Рецепты, добавленные после построения, появятся после перестройки.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.built_at = None
+        self.state = None
+
+    def build(self):
+        rows = RecipeIngredient.objects.order_by().values_list(
+            'ingredient_id', 'recipe_id'
+        ).iterator(chunk_size=ROWS_CHUNK_SIZE)
+        pairs = np.fromiter(
+            chain.from_iterable(rows), dtype=np.int64
+        ).reshape(-1, 2)
+        ingredients, recipes = pairs[:, 0], pairs[:, 1]
+        order = np.lexsort((recipes, ingredients))
+        ingredients, recipes = ingredients[order], recipes[order]
+        keys, starts = np.unique(ingredients, return_index=True)
+        ends = np.append(starts[1:], len(recipes))
+        postings = {
+            int(key): recipes[start:end]
+            for key, start, end in zip(keys, starts, ends)
+        }
+        recipe_ids, recipe_sizes = np.unique(recipes, return_counts=True)
+        self.state = (postings, recipe_ids, recipe_sizes)
+        self.built_at = monotonic()
+
+    def refresh(self):
+        """Перестройка устаревшего индекса.
+
+        Пока один поток перестраивает индекс, остальные отвечают
+        по предыдущей версии.
+        """
+        if self.built_at is not None and (
+            monotonic() - self.built_at <= settings.INGREDIENT_INDEX_TTL
+        ):
+            return self.state
+        if self.lock.acquire(blocking=self.state is None):
+            try:
+                if self.built_at is None or (
+                    monotonic() - self.built_at
+                    > settings.INGREDIENT_INDEX_TTL
+                ):
+                    self.build()
+            finally:
+                self.lock.release()
+        return self.state
+
+    def rank(self, ingredient_ids):
+        """id рецептов, в которых есть хотя бы один из ингредиентов.
+
+        Сначала рецепты с наибольшей долей имеющихся ингредиентов,
+        затем с наибольшим их числом.
+        """
+        postings, all_recipe_ids, recipe_sizes = self.refresh()
+        postings = [
+            postings[pk] for pk in set(ingredient_ids) if pk in postings
+        ]
+        if not postings:
+            return []
+        recipe_ids, matched = np.unique(
+            np.concatenate(postings), return_counts=True
+        )
+        sizes = recipe_sizes[np.searchsorted(all_recipe_ids, recipe_ids)]
+        coverage = matched / sizes
+        order = np.lexsort((recipe_ids, -matched, -coverage))
+        return recipe_ids[order].tolist()
+
+
+ingredient_index = IngredientIndex()
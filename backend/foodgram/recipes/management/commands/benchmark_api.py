@@ -0,0 +1,371 @@
+import base64
+import json
+import re
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from time import perf_counter, sleep
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.images import variants_executor
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+READ_CHUNK_SIZE = 1024
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def image_data():
+    buffer = BytesIO()
+    Image.new('RGB', (600, 400), '#49B64E').save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+def wait_for_background():
+    """Ожидание фоновой обработки картинок, запущенной запросами."""
+    barrier = threading.Barrier(settings.IMAGE_WORKERS)
+    for future in [
+        variants_executor.submit(barrier.wait)
+        for _ in range(settings.IMAGE_WORKERS)
+    ]:
+        future.result()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Measures throughput, p50/p99 latency and query counts '
+            'for every API route in-process and saves them as JSON. '
+            'Run seed_data first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--output', default='benchmark.json',
+            help='JSON file for the results',
+        )
+        parser.add_argument(
+            '--compare',
+            help='Previous results to print the difference with',
+        )
+        parser.add_argument(
+            '--route', action='append', default=[],
+            help='Run only routes whose name starts with the value',
+        )
+        parser.add_argument(
+            '--url',
+            help='Benchmark read routes of a running server instead, '
+                 'e.g. http://localhost:8000',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=10,
+            help='Parallel clients with --url',
+        )
+        parser.add_argument(
+            '--read-delay', type=float, default=0,
+            help='Seconds a client waits after each 1 KB of a response '
+                 'with --url, to imitate slow clients',
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.annotate(
+            activity=Count('favorites', distinct=True)
+            + Count('carts', distinct=True)
+        ).order_by('-activity', 'pk').first()
+        recipe = Recipe.objects.exclude(author=user).exclude(
+            favorites__user=user
+        ).exclude(carts__user=user).exclude(
+            author__following__user=user
+        ).order_by('pk').first()
+        if user is None or recipe is None:
+            raise CommandError('Seed the database with seed_data first')
+        token, _ = Token.objects.get_or_create(user=user)
+        self.authorization = f'Token {token.key}'
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.authorization)
+        routes = [
+            route for route in self.routes(user, recipe)
+            if not options['route'] or any(
+                route[0].startswith(prefix) for prefix in options['route']
+            )
+        ]
+        results = {}
+        if options['url']:
+            for name, *steps in routes:
+                if len(steps) == 1 and steps[0][0] == 'get':
+                    results[name] = self.measure_live(
+                        options['url'] + steps[0][1], options
+                    )
+        else:
+            hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+            with override_settings(ALLOWED_HOSTS=hosts):
+                for name, *steps in routes:
+                    results.update(self.measure(
+                        name, steps, options['requests'], options['warmup']
+                    ))
+        report = {
+            'meta': {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'url': options['url'],
+                'concurrency': options['concurrency']
+                if options['url'] else 1,
+                'read_delay': options['read_delay'],
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+            },
+            'routes': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        previous = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)['routes']
+        self.print_report(results, previous)
+        self.stdout.write(self.style.SUCCESS(
+            f'Results saved to {options["output"]}'
+        ))
+
+    def routes(self, user, recipe):
+        """Маршруты api/urls.py: (имя, (метод, путь, данные), ...).
+
+        Изменяющие запросы идут парами, чтобы данные не менялись
+        от прогона к прогону.
+        """
+        author = recipe.author_id
+        tag = Tag.objects.order_by('pk').first()
+        slugs = list(Tag.objects.order_by('pk').values_list(
+            'slug', flat=True
+        )[:2])
+        ingredients = list(Ingredient.objects.filter(
+            recipeingredients__recipe=recipe
+        ).values_list('pk', flat=True))
+        recipe_data = {
+            'ingredients': [
+                {'id': pk, 'amount': 10} for pk in ingredients
+            ],
+            'tags': [tag.pk],
+            'image': image_data(),
+            'name': 'Тестовый рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+        }
+        own_recipe = Recipe.objects.filter(author=user).first()
+        recipes = '/api/recipes/'
+        routes = [
+            ('users-list', ('get', '/api/users/', None)),
+            ('users-detail', ('get', f'/api/users/{author}/', None)),
+            ('users-me', ('get', '/api/users/me/', None)),
+            ('users-subscriptions', (
+                'get', '/api/users/subscriptions/?recipes_limit=3', None
+            )),
+            ('users-subscriptions-cursor', (
+                'get', '/api/users/subscriptions/?pagination=cursor', None
+            )),
+            ('users-subscribe', (
+                'post', f'/api/users/{author}/subscribe/', None
+            ), ('delete', f'/api/users/{author}/subscribe/', None)),
+            ('tags-list', ('get', '/api/tags/', None)),
+            ('tags-detail', ('get', f'/api/tags/{tag.pk}/', None)),
+            ('ingredients-list', ('get', '/api/ingredients/', None)),
+            ('ingredients-search', (
+                'get', '/api/ingredients/?name=мол', None
+            )),
+            ('ingredients-detail', (
+                'get', f'/api/ingredients/{ingredients[0]}/', None
+            )),
+            ('recipes-list', ('get', recipes, None)),
+            ('recipes-list-tags', (
+                'get', f'{recipes}?{"&".join(f"tags={s}" for s in slugs)}',
+                None
+            )),
+            ('recipes-list-author', (
+                'get', f'{recipes}?author={author}', None
+            )),
+            ('recipes-list-favorited', (
+                'get', f'{recipes}?is_favorited=1', None
+            )),
+            ('recipes-list-cart', (
+                'get', f'{recipes}?is_in_shopping_cart=1', None
+            )),
+            ('recipes-list-search', ('get', f'{recipes}?search=суп', None)),
+            ('recipes-list-popular', (
+                'get', f'{recipes}?ordering=popular', None
+            )),
+            ('recipes-list-trending', (
+                'get', f'{recipes}?ordering=trending', None
+            )),
+            ('recipes-list-cursor', (
+                'get', f'{recipes}?pagination=cursor', None
+            )),
+            ('recipes-detail', ('get', f'{recipes}{recipe.pk}/', None)),
+            ('recipes-by-ingredients', (
+                'get',
+                f'{recipes}by_ingredients/?ingredients='
+                f'{",".join(map(str, ingredients[:3]))}',
+                None
+            )),
+            ('recipes-favorite', (
+                'post', f'{recipes}{recipe.pk}/favorite/', None
+            ), ('delete', f'{recipes}{recipe.pk}/favorite/', None)),
+            ('recipes-shopping-cart', (
+                'post', f'{recipes}{recipe.pk}/shopping_cart/', None
+            ), ('delete', f'{recipes}{recipe.pk}/shopping_cart/', None)),
+            ('recipes-create', ('post', recipes, recipe_data), (
+                'delete', lambda response: f'{recipes}{response["id"]}/',
+                None
+            )),
+        ]
+        if own_recipe is not None:
+            routes.append(('recipes-update', (
+                'patch', f'{recipes}{own_recipe.pk}/',
+                {**recipe_data, 'name': own_recipe.name}
+            )))
+        routes += [
+            (f'recipes-download-{file_type}', (
+                'get',
+                f'{recipes}download_shopping_cart/?type={file_type}',
+                None
+            ))
+            for file_type in ('txt', 'csv', 'pdf')
+        ]
+        return routes
+
+    def request(self, method, path, data):
+        """Запрос целиком, включая потоковое тело ответа."""
+        with CaptureQueriesContext(connection) as queries:
+            started = perf_counter()
+            response = getattr(self.client, method)(
+                path, data, format='json'
+            )
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = perf_counter() - started
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{method.upper()} {path}: {response.status_code} '
+                f'{getattr(response, "data", "")}'
+            )
+        return response, elapsed, len(queries)
+
+    def measure(self, name, steps, requests, warmup):
+        timings = [[] for _ in steps]
+        queries = [[] for _ in steps]
+        for iteration in range(warmup + requests):
+            previous = None
+            for index, (method, path, data) in enumerate(steps):
+                if callable(path):
+                    path = path(previous.data)
+                previous, elapsed, count = self.request(method, path, data)
+                if iteration >= warmup:
+                    timings[index].append(elapsed)
+                    queries[index].append(count)
+            wait_for_background()
+        results = {}
+        for index, (method, path, _) in enumerate(steps):
+            step_name = name if index == 0 else f'{name}-{method}'
+            results[step_name] = {
+                'method': method.upper(),
+                'path': path if isinstance(path, str) else None,
+                'throughput': len(timings[index]) / sum(timings[index]),
+                'p50_ms': statistics.median(timings[index]) * 1000,
+                'p99_ms': percentile(timings[index], 0.99) * 1000,
+                'queries': statistics.median(queries[index]),
+            }
+        return results
+
+    def measure_live(self, url, options):
+        """Чтение маршрута запущенного сервера параллельными клиентами.
+
+        Пропускная способность считается по общему времени прогона,
+        число запросов к базе берётся из заголовка Server-Timing
+        (REQUEST_METRICS_SERVER_TIMING).
+        """
+        timings = []
+        queries = []
+        errors = []
+        lock = threading.Lock()
+
+        def run_client(count):
+            with requests.Session() as session:
+                session.headers['Authorization'] = self.authorization
+                # Сервер может закрыть простаивающее keep-alive соединение.
+                session.mount(url, requests.adapters.HTTPAdapter(
+                    max_retries=1
+                ))
+                for _ in range(count):
+                    started = perf_counter()
+                    response = session.get(url, stream=True)
+                    for _ in response.iter_content(READ_CHUNK_SIZE):
+                        sleep(options['read_delay'])
+                    elapsed = perf_counter() - started
+                    match = SERVER_TIMING_QUERIES.search(
+                        response.headers.get('Server-Timing', '')
+                    )
+                    with lock:
+                        if response.status_code >= 400:
+                            errors.append(response.status_code)
+                        timings.append(elapsed)
+                        if match:
+                            queries.append(int(match[1]))
+
+        run_client(options['warmup'])
+        timings.clear()
+        queries.clear()
+        concurrency = options['concurrency']
+        started = perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            list(executor.map(run_client, [
+                options['requests'] // concurrency
+                + (index < options['requests'] % concurrency)
+                for index in range(concurrency)
+            ]))
+        elapsed = perf_counter() - started
+        if errors:
+            raise CommandError(f'GET {url}: {errors[0]}')
+        return {
+            'method': 'GET',
+            'path': url,
+            'throughput': len(timings) / elapsed,
+            'p50_ms': statistics.median(timings) * 1000,
+            'p99_ms': percentile(timings, 0.99) * 1000,
+            'queries': statistics.median(queries) if queries else 0,
+        }
+
+    def print_report(self, results, previous):
+        self.stdout.write(
+            f'{"route":36} {"rps":>8} {"p50 ms":>8} {"p99 ms":>8} '
+            f'{"queries":>7}'
+        )
+        for name, result in results.items():
+            line = (
+                f'{name:36} {result["throughput"]:8.1f} '
+                f'{result["p50_ms"]:8.2f} {result["p99_ms"]:8.2f} '
+                f'{result["queries"]:7g}'
+            )
+            old = previous.get(name)
+            if old:
+                change = (result['p50_ms'] / old['p50_ms'] - 1) * 100
+                line += f'  p50 {change:+.0f}%'
+                if result['queries'] != old['queries']:
+                    line += (f', queries {old["queries"]:g} -> '
+                             f'{result["queries"]:g}')
+            self.stdout.write(line)
@@ -0,0 +1,80 @@
+from time import perf_counter
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.views import APIView
+
+from api.authentication import CachedTokenAuthentication, invalidate_token
+from users.models import User
+
+URL = '/api/users/me/'
+MODES = (
+    ('uncached', TokenAuthentication, {}),
+    ('shared', CachedTokenAuthentication, {'AUTH_TOKEN_LOCAL_TTL': 0}),
+    ('local', CachedTokenAuthentication, {}),
+)
+
+
+class Command(BaseCommand):
+    help = ('Measures requests per second of one sync worker on '
+            f'{URL} with TokenAuthentication, with CachedTokenAuthentication '
+            'reading the tokens cache on every request (shared) and with '
+            'its per-process LRU (local). The user and token are rolled '
+            'back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--warmup', type=int, default=100)
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), override_settings(
+            REQUEST_METRICS_ENABLED=False
+        ):
+            user = User.objects.create(
+                email='benchmark@example.com', username='benchmark',
+                first_name='Бенчмарк', last_name='Бенчмарк',
+            )
+            token = Token.objects.create(user=user)
+            client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+            self.stdout.write(
+                f'{"auth":<9} {"req/s":>8} {"ms/req":>7} {"queries":>8}'
+            )
+            try:
+                for name, authentication, overrides in MODES:
+                    with mock.patch.object(
+                        APIView, 'authentication_classes', [authentication]
+                    ), override_settings(**overrides):
+                        self.run(name, client, options)
+            finally:
+                invalidate_token(token.key)
+            transaction.set_rollback(True)
+
+    def run(self, name, client, options):
+        for _ in range(options['warmup']):
+            client.get(URL)
+        queries = []
+
+        def log_query(execute, sql, *args):
+            queries.append(sql)
+            return execute(sql, *args)
+
+        with connection.execute_wrapper(log_query):
+            self.check_response(client.get(URL))
+        started = perf_counter()
+        for _ in range(options['requests']):
+            client.get(URL)
+        elapsed = perf_counter() - started
+        self.stdout.write(
+            f'{name:<9} {options["requests"] / elapsed:>8.0f} '
+            f'{elapsed * 1000 / options["requests"]:>7.2f} '
+            f'{len(queries):>8}'
+        )
+
+    @staticmethod
+    def check_response(response):
+        assert response.status_code == 200, response.content
@@ -0,0 +1,112 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.ingredient_index import IngredientIndex
+from recipes.management.synthetic import (analyze, benchmark_author,
+                                          ensure_ingredients,
+                                          insert_recipe_ingredients,
+                                          insert_recipes, measure, set_seed)
+from recipes.models import RecipeIngredient
+
+MB = 1024 * 1024
+PAGE_SIZE = 6
+SELECTION_SIZES = (1, 3, 10, 30)
+
+
+class Command(BaseCommand):
+    help = ('Measures the inverted ingredient index behind '
+            'recipes/by_ingredients on a synthetic RecipeIngredient table '
+            'of each size: build time, memory and ranking latency against '
+            'the same ranking computed by a SQL aggregation. Generated rows '
+            'are rolled back (PostgreSQL only).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, action='append', default=[],
+            help='Total RecipeIngredient rows, may be repeated '
+                 '(default 1000000)',
+        )
+        parser.add_argument(
+            '--per-recipe', type=int, default=10,
+            help='Ingredients of each generated recipe',
+        )
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The benchmark runs only on PostgreSQL')
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            set_seed(options['seed'])
+            author = benchmark_author()
+            ingredient_ids = ensure_ingredients(options['ingredients'])
+            for rows in sorted(options['rows'] or [1000000]):
+                missing = rows - RecipeIngredient.objects.count()
+                if missing > 0:
+                    after = insert_recipes(
+                        -(-missing // options['per_recipe']), author.pk
+                    )
+                    insert_recipe_ingredients(
+                        after, options['per_recipe'], ingredient_ids
+                    )
+                    analyze()
+                self.run(rng, ingredient_ids, options['repeat'])
+            transaction.set_rollback(True)
+
+    def run(self, rng, ingredient_ids, repeat):
+        index = IngredientIndex()
+        started = perf_counter()
+        index.build()
+        built = perf_counter() - started
+        postings, recipe_ids, recipe_sizes = index.state
+        memory = (
+            sum(posting.nbytes for posting in postings.values())
+            + recipe_ids.nbytes + recipe_sizes.nbytes
+        )
+        self.stdout.write(
+            f'{RecipeIngredient.objects.count()} rows, '
+            f'{len(recipe_ids)} recipes: index built in {built:.2f} s, '
+            f'arrays {memory / MB:.1f} MB'
+        )
+        self.stdout.write(
+            f'{"ingredients":>11} {"found":>8} {"index p50":>10} '
+            f'{"index p95":>10} {"sql p50":>9} {"sql p95":>9} same'
+        )
+        for size in SELECTION_SIZES:
+            selection = rng.sample(ingredient_ids, size)
+            index_p50, index_p95, ranked = measure(
+                lambda: index.rank(selection), repeat
+            )
+            sql_p50, sql_p95, page = measure(
+                lambda: self.sql_rank(selection), repeat
+            )
+            self.stdout.write(
+                f'{size:>11} {len(ranked):>8} {index_p50:>10.2f} '
+                f'{index_p95:>10.2f} {sql_p50:>9.1f} {sql_p95:>9.1f} '
+                f'{"yes" if ranked[:PAGE_SIZE] == page else "no"}'
+            )
+
+    @staticmethod
+    def sql_rank(ingredient_ids):
+        """Первая страница того же ранжирования агрегацией в базе."""
+        table = RecipeIngredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT recipe_id FROM ('
+                'SELECT recipe_id, count(*) FILTER ('
+                'WHERE ingredient_id = ANY(%(ids)s)) AS matched, '
+                'count(*) AS total '
+                f'FROM {table} WHERE recipe_id IN ('
+                f'SELECT recipe_id FROM {table} '
+                'WHERE ingredient_id = ANY(%(ids)s)) '
+                'GROUP BY recipe_id) AS ranked '
+                'ORDER BY matched::float / total DESC, matched DESC, '
+                'recipe_id LIMIT %(limit)s',
+                {'ids': ingredient_ids, 'limit': PAGE_SIZE}
+            )
+            return [recipe_id for recipe_id, in cursor.fetchall()]
@@ -0,0 +1,172 @@
+from collections import Counter
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.serializers import RecipeCreateSerializer
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem, Tag)
+from users.models import User
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class LegacyRecipeSerializer(RecipeCreateSerializer):
+    """Прежнее обновление: теги и ингредиенты очищаются и создаются заново."""
+    def update(self, recipe, validated_data):
+        recipe.tags.clear()
+        return super().update(recipe, validated_data)
+
+    def update_ingredients(self, new_ingredients, recipe):
+        old_amounts = ShoppingListItem.objects.recipe_amounts(recipe.pk)
+        recipe.ingredients.clear()
+        self.create_ingredients(new_ingredients, recipe)
+        new_amounts = ShoppingListItem.objects.recipe_amounts(recipe.pk)
+        return {
+            ingredient_id: (
+                new_amounts.get(ingredient_id, 0)
+                - old_amounts.get(ingredient_id, 0)
+            )
+            for ingredient_id in old_amounts.keys() | new_amounts.keys()
+        }
+
+
+class WriteCounter:
+    """Число изменяющих запросов и затронутых ими строк."""
+    def __init__(self):
+        self.statements = Counter()
+        self.rows = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        verb = sql.lstrip().split(None, 1)[0].upper()
+        if verb in WRITES:
+            self.statements[verb] += 1
+            self.rows[verb] += max(context['cursor'].rowcount, 0)
+        return result
+
+
+class Command(BaseCommand):
+    help = ('Measures write amplification of typical edits of a recipe '
+            'with many ingredients held in several carts: statements and '
+            'rows written by the diff-based update and by the former '
+            'clear-and-recreate update. Changes are rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ingredients', type=int, default=35)
+        parser.add_argument('--carts', type=int, default=2)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipe, data = self.prepare(
+                options['ingredients'], options['carts']
+            )
+            self.stdout.write(
+                f'{"edit":<12} {"update":<8} {"INSERT":>7} {"UPDATE":>7} '
+                f'{"DELETE":>7} {"rows":>6} {"ms":>7}'
+            )
+            for name, edit in self.edits(data).items():
+                for label, serializer_class in (
+                    ('diff', RecipeCreateSerializer),
+                    ('legacy', LegacyRecipeSerializer),
+                ):
+                    counter, elapsed = self.run(
+                        serializer_class, recipe, edit
+                    )
+                    self.stdout.write(
+                        f'{name:<12} {label:<8} '
+                        + ' '.join(
+                            f'{counter.statements[verb]:>7}'
+                            for verb in WRITES
+                        )
+                        + f' {sum(counter.rows.values()):>6}'
+                        f' {elapsed * 1000:>7.1f}'
+                    )
+            transaction.set_rollback(True)
+
+    def prepare(self, ingredients_count, carts):
+        """Рецепт с ingredients_count ингредиентами в carts корзинах."""
+        missing = ingredients_count + 5 - Ingredient.objects.count()
+        if missing > 0:
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f'benchmark {index}', measurement_unit='г')
+                for index in range(missing)
+            )
+        if Tag.objects.count() < 2:
+            for slug in ('benchmark1', 'benchmark2'):
+                Tag.objects.create(name=slug, color=f'#{slug}', slug=slug)
+        users = [
+            User.objects.create(
+                email=f'benchmark{index}@example.com',
+                username=f'benchmark_{index}',
+            )
+            for index in range(carts + 1)
+        ]
+        recipe = Recipe.objects.create(
+            author=users[0], name='Benchmark', text='Описание',
+            cooking_time=10, image='recipes/benchmark.png',
+        )
+        ingredient_ids = list(Ingredient.objects.order_by('pk').values_list(
+            'pk', flat=True
+        )[:ingredients_count + 5])
+        tag_ids = list(Tag.objects.order_by('pk').values_list(
+            'pk', flat=True
+        )[:2])
+        recipe.tags.set(tag_ids)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=100
+            )
+            for ingredient_id in ingredient_ids[:ingredients_count]
+        )
+        for user in users[1:]:
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+        ShoppingListItem.objects.add_recipe(
+            [user.pk for user in users[1:]], recipe.pk
+        )
+        data = {
+            'name': recipe.name, 'text': recipe.text, 'cooking_time': 10,
+            'tags': tag_ids,
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 100}
+                for ingredient_id in ingredient_ids[:ingredients_count]
+            ],
+            'spare': ingredient_ids[ingredients_count:],
+        }
+        return recipe, data
+
+    @staticmethod
+    def edits(data):
+        spare = data.pop('spare')
+        ingredients = data['ingredients']
+        return {
+            'name': {**data, 'name': 'Benchmark 2'},
+            'amount': {**data, 'ingredients': [
+                {**ingredients[0], 'amount': 150}, *ingredients[1:]
+            ]},
+            'add': {**data, 'ingredients': [
+                *ingredients, {'id': spare[0], 'amount': 100}
+            ]},
+            'remove': {**data, 'ingredients': ingredients[1:]},
+            'replace-5': {**data, 'ingredients': [
+                *ingredients[5:],
+                *({'id': pk, 'amount': 100} for pk in spare[:5]),
+            ]},
+            'tag': {**data, 'tags': data['tags'][:1]},
+        }
+
+    @staticmethod
+    def run(serializer_class, recipe, data):
+        """Правка рецепта в точке сохранения, которая затем откатывается."""
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        serializer = serializer_class(recipe, data=data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        counter = WriteCounter()
+        with transaction.atomic():
+            with connection.execute_wrapper(counter):
+                started = perf_counter()
+                serializer.save()
+                elapsed = perf_counter() - started
+            transaction.set_rollback(True)
+        return counter, elapsed
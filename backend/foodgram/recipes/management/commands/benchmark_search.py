@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+
+from api.filters import RecipeFilter
+from recipes.management.synthetic import (analyze, benchmark_author,
+                                          ensure_ingredients,
+                                          insert_recipe_ingredients,
+                                          insert_recipes, measure,
+                                          plan_indexes, set_seed)
+from recipes.models import Recipe
+
+PAGE_SIZE = 6
+QUERIES = ('борщ', 'острый суп', 'бабушкин пирог -блины', 'слово1',
+           'слово4321', 'ингредиент 7', 'тирамису')
+
+
+class Command(BaseCommand):
+    help = ('Measures full-text recipe search on a synthetic recipe table '
+            'of each size: first page ranked by relevance and COUNT, '
+            'as RecipeViewSet runs them, with the indexes in the plan. '
+            'Generated rows are rolled back (PostgreSQL only).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, action='append', default=[],
+            help='Total recipes in the table, may be repeated '
+                 '(default 100000 and 1000000)',
+        )
+        parser.add_argument(
+            '--query', action='append', default=[],
+            help='Search string, may be repeated',
+        )
+        parser.add_argument('--ingredients', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Search vectors are stored only in PostgreSQL')
+        sizes = sorted(options['recipes'] or [100000, 1000000])
+        queries = options['query'] or QUERIES
+        with transaction.atomic():
+            set_seed(options['seed'])
+            author = benchmark_author()
+            ingredient_ids = ensure_ingredients(1000)
+            self.stdout.write(
+                f'{"recipes":>8} {"query":<24} {"found":>8} '
+                f'{"page p50":>9} {"page p95":>9} {"count p50":>10}  plan'
+            )
+            for size in sizes:
+                missing = size - Recipe.objects.count()
+                if missing > 0:
+                    after = insert_recipes(missing, author.pk)
+                    insert_recipe_ingredients(
+                        after, options['ingredients'], ingredient_ids
+                    )
+                    Recipe.objects.filter(pk__gt=after).update_search_vector()
+                    analyze()
+                for query in queries:
+                    self.run(size, query, options['repeat'])
+            transaction.set_rollback(True)
+
+    def run(self, size, query, repeat):
+        params = QueryDict(mutable=True)
+        params['search'] = query
+        queryset = RecipeFilter(
+            params, queryset=Recipe.objects.defer('search_vector')
+        ).qs
+        page = queryset.values_list('pk', flat=True)[:PAGE_SIZE]
+        page_p50, page_p95, _ = measure(lambda: list(page.all()), repeat)
+        count_p50, _, found = measure(queryset.count, repeat)
+        self.stdout.write(
+            f'{size:>8} {query:<24} {found:>8} {page_p50:>9.1f} '
+            f'{page_p95:>9.1f} {count_p50:>10.1f}  '
+            + ', '.join(plan_indexes(page))
+        )
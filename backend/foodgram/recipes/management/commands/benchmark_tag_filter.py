@@ -0,0 +1,102 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+
+from api.cache import TAGS_VERSION, bump_version
+from api.filters import RecipeFilter
+from recipes.management.synthetic import (analyze, benchmark_author,
+                                          ensure_tags, insert_recipe_tags,
+                                          insert_recipes, measure,
+                                          plan_indexes, set_seed)
+from recipes.models import Recipe, Tag
+
+PAGE_SIZE = 6
+SELECTION_SIZES = (1, 3, 10)
+
+
+class Command(BaseCommand):
+    help = ('Measures the tags filter on a synthetic recipe table of each '
+            'size with many tags: first page and COUNT with the EXISTS '
+            'subquery of RecipeFilter and with the former JOIN and '
+            'DISTINCT, and checks that both return the same recipes. '
+            'Generated rows are rolled back (PostgreSQL only).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, action='append', default=[],
+            help='Total recipes in the table, may be repeated '
+                 '(default 100000 and 1000000)',
+        )
+        parser.add_argument('--tags', type=int, default=100)
+        parser.add_argument(
+            '--per-recipe', type=int, default=3,
+            help='Tags drawn for each generated recipe',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The benchmark runs only on PostgreSQL')
+        rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                set_seed(options['seed'])
+                author = benchmark_author()
+                tag_ids = ensure_tags(options['tags'])
+                bump_version(TAGS_VERSION)
+                slugs = list(Tag.objects.order_by('pk').values_list(
+                    'slug', flat=True
+                ))
+                self.stdout.write(
+                    f'{"recipes":>8} {"tags":>4} {"filter":>7} '
+                    f'{"found":>8} {"page p50":>9} {"page p95":>9} '
+                    f'{"count p50":>10} same  plan'
+                )
+                for size in sorted(options['recipes'] or [100000, 1000000]):
+                    missing = size - Recipe.objects.count()
+                    if missing > 0:
+                        after = insert_recipes(missing, author.pk)
+                        insert_recipe_tags(
+                            after, options['per_recipe'], tag_ids
+                        )
+                        analyze()
+                    for count in SELECTION_SIZES:
+                        self.run(
+                            size, rng.sample(slugs, count), options['repeat']
+                        )
+                transaction.set_rollback(True)
+        finally:
+            bump_version(TAGS_VERSION)
+
+    def run(self, size, slugs, repeat):
+        params = QueryDict(mutable=True)
+        params.setlist('tags', slugs)
+        recipe_filter = RecipeFilter(
+            params, queryset=Recipe.objects.defer('search_vector')
+        )
+        if not recipe_filter.is_valid():
+            raise CommandError(recipe_filter.errors.as_json())
+        querysets = {
+            'exists': recipe_filter.qs,
+            'join': Recipe.objects.defer('search_vector').filter(
+                tags__slug__in=slugs
+            ).distinct(),
+        }
+        pages = {}
+        for name, queryset in querysets.items():
+            page = queryset.order_by('name', 'pk').values_list(
+                'pk', flat=True
+            )[:PAGE_SIZE]
+            page_p50, page_p95, pages[name] = measure(
+                lambda: list(page.all()), repeat
+            )
+            count_p50, _, found = measure(queryset.count, repeat)
+            same = 'yes' if pages[name] == pages['exists'] else 'no'
+            self.stdout.write(
+                f'{size:>8} {len(slugs):>4} {name:>7} {found:>8} '
+                f'{page_p50:>9.1f} {page_p95:>9.1f} {count_p50:>10.1f} '
+                f'{same:<4}  ' + ', '.join(plan_indexes(page))
+            )
@@ -0,0 +1,87 @@
+import base64
+import json
+import os
+import tracemalloc
+from io import BytesIO
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.parsers import JSONParser
+
+from api.parsers import StreamingImageJSONParser
+
+MB = 1024 * 1024
+
+
+def recipe_body(size):
+    """JSON рецепта с картинкой из size случайных байт в base64."""
+    image = base64.b64encode(os.urandom(size)).decode()
+    return json.dumps({
+        'ingredients': [{'id': 1, 'amount': 10}],
+        'tags': [1],
+        'image': f'data:image/png;base64,{image}',
+        'name': 'Рецепт',
+        'text': 'Описание',
+        'cooking_time': 10,
+    }).encode()
+
+
+def parse(parser, body):
+    """Пиковая память Python и время разбора тела запроса."""
+    stream = BytesIO(body)
+    tracemalloc.start()
+    started = perf_counter()
+    data = parser.parse(stream, 'application/json', {})
+    elapsed = perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    image = data['image']
+    if hasattr(image, 'close'):
+        image.close()
+    return peak, elapsed
+
+
+class Command(BaseCommand):
+    help = ('Measures peak Python memory and time of parsing a recipe '
+            'JSON body with an image of each size by the streaming parser '
+            'and by the plain DRF JSONParser.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size', type=int, action='append', default=[],
+            help='Decoded image size in MB, may be repeated '
+                 '(default 1, 5 and 10)',
+        )
+        parser.add_argument(
+            '--output', help='JSON file for the results',
+        )
+
+    def handle(self, *args, **options):
+        sizes = options['size'] or [1, 5, 10]
+        parsers = (
+            ('streaming', StreamingImageJSONParser()),
+            ('drf', JSONParser()),
+        )
+        results = []
+        self.stdout.write(
+            f'{"image MB":>8} {"body MB":>8} {"parser":>10} '
+            f'{"peak MB":>8} {"ms":>8}'
+        )
+        with override_settings(RECIPE_IMAGE_MAX_SIZE=max(sizes) * MB):
+            for size in sizes:
+                body = recipe_body(size * MB)
+                for name, parser in parsers:
+                    peak, elapsed = parse(parser, body)
+                    results.append({
+                        'image_mb': size, 'body_mb': len(body) / MB,
+                        'parser': name, 'peak_mb': peak / MB,
+                        'ms': elapsed * 1000,
+                    })
+                    self.stdout.write(
+                        f'{size:>8} {len(body) / MB:>8.1f} {name:>10} '
+                        f'{peak / MB:>8.2f} {elapsed * 1000:>8.1f}'
+                    )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2)
@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.metrics import histogram
+
+
+class Command(BaseCommand):
+    help = 'Prints per-action request metrics collected by the middleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Print the full report with histograms as JSON',
+        )
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Clear collected metrics after printing',
+        )
+
+    def handle(self, *args, **options):
+        histogram.flush()
+        report = histogram.read()
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_table(report)
+        if options['reset']:
+            histogram.reset()
+            self.stdout.write('Metrics cleared')
+
+    def print_table(self, report):
+        self.stdout.write(
+            f'{"action":<40} {"count":>7} {"p50 ms":>7} {"p99 ms":>7} '
+            f'{"db ms":>7} {"conn ms":>7} {"pool ms":>7} {"queries":>7} '
+            f'{"dup":>5}'
+        )
+        rows = sorted(
+            report.items(),
+            key=lambda item: item[1]['total']['p99'] or 0, reverse=True
+        )
+        for tag, entry in rows:
+            self.stdout.write(
+                f'{tag:<40} {entry["count"]:>7} '
+                f'{entry["total"]["p50"]:>7} {entry["total"]["p99"]:>7} '
+                f'{entry["db"]["mean"]:>7.1f} '
+                f'{entry["connect"]["mean"]:>7.1f} '
+                f'{entry["pool_wait"]["mean"]:>7.1f} '
+                f'{entry["queries"]["mean"]:>7.1f} '
+                f'{entry["duplicates"]:>5}'
+            )
+            if entry['duplicate_sample']:
+                self.stdout.write(
+                    f'    repeated SQL: {entry["duplicate_sample"][:200]}'
+                )
@@ -1,31 +1,127 @@
 import csv
+import json
 import os
+from itertools import islice
+from time import monotonic
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from api.cache import INGREDIENTS_VERSION, bump_version
 from recipes.models import Ingredient
 
-DATABASES_DICT = {
-    Ingredient: 'ingredients.csv',
-}
-
 DATA_DIR = os.path.join(settings.BASE_DIR, 'data')
+DEFAULT_FILE = os.path.join(DATA_DIR, 'ingredients.csv')
+HEADER = ('name', 'measurement_unit')
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) < 2 or tuple(row[:2]) == HEADER:
+            continue
+        yield row[0].strip(), row[1].strip()
+
+
+def read_json(file):
+    for item in json.load(file):
+        yield item['name'].strip(), item['measurement_unit'].strip()
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
 
 
 class Command(BaseCommand):
-    help = 'Loads the data from csv files located in static/data folder'
+    help = 'Loads ingredients from a csv or json file (data/ingredients.csv)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=DEFAULT_FILE,
+            help='Path to a .csv or .json file with ingredients',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Rows inserted per query',
+        )
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Load a csv file with PostgreSQL COPY through a '
+                 'staging table',
+        )
 
     def handle(self, *args, **options):
-        for model, csv_file in DATABASES_DICT.items():
-            with open(
-                os.path.join(DATA_DIR, csv_file), 'r',
-                encoding='utf-8',
-            ) as file:
-                reader = csv.reader(file)
-                next(reader)
-                for data in reader:
-                    model.objects.get_or_create(
-                        name=data[0], measurement_unit=data[1]
-                    )
-        self.stdout.write(self.style.SUCCESS('Successfully loaded data'))
+        path = options['path']
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in READERS:
+            raise CommandError(
+                f'Unsupported file type: {extension or path}. '
+                f'Use one of: {", ".join(READERS)}'
+            )
+        if options['copy'] and (
+            extension != '.csv' or connection.vendor != 'postgresql'
+        ):
+            raise CommandError('--copy requires a csv file and PostgreSQL')
+        initial_count = Ingredient.objects.count()
+        started = monotonic()
+        with open(path, 'r', encoding='utf-8', newline='') as file:
+            if options['copy']:
+                processed = self.copy(file)
+            else:
+                processed = self.bulk_insert(
+                    READERS[extension](file), options['batch_size'], started
+                )
+        elapsed = max(monotonic() - started, 1e-6)
+        created = Ingredient.objects.count() - initial_count
+        if created:
+            bump_version(INGREDIENTS_VERSION)
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully loaded data: {processed} rows processed, '
+            f'{created} created in {elapsed:.2f}s '
+            f'({processed / elapsed:.0f} rows/s)'
+        ))
+
+    def bulk_insert(self, rows, batch_size, started):
+        processed = 0
+        while True:
+            batch = [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in islice(rows, batch_size)
+            ]
+            if not batch:
+                return processed
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            processed += len(batch)
+            elapsed = max(monotonic() - started, 1e-6)
+            self.stdout.write(
+                f'{processed} rows processed '
+                f'({processed / elapsed:.0f} rows/s)'
+            )
+
+    @transaction.atomic
+    def copy(self, file):
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_import '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_import FROM STDIN WITH (FORMAT csv)', file
+            )
+            cursor.execute(
+                'DELETE FROM ingredient_import '
+                'WHERE name = %s AND measurement_unit = %s', HEADER
+            )
+            cursor.execute('SELECT count(*) FROM ingredient_import')
+            processed = cursor.fetchone()[0]
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT DISTINCT trim(name), trim(measurement_unit) '
+                f'FROM ingredient_import '
+                f'ON CONFLICT ON CONSTRAINT unique_name_measurement_unit '
+                f'DO NOTHING'
+            )
+        return processed
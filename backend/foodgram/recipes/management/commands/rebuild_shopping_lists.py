@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import RecipeIngredient, ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+def live_totals():
+    """Итоги списков покупок, посчитанные по рецептам в корзинах."""
+    return {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in RecipeIngredient.objects.filter(
+            recipe__carts__isnull=False
+        ).values_list(
+            'recipe__carts__user', 'ingredient'
+        ).annotate(total=Sum('amount')).order_by()
+    }
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds shopping list totals and verifies them against carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only verify stored totals without rebuilding them',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            self.rebuild()
+        mismatches = self.verify()
+        if mismatches:
+            raise CommandError(
+                f'Found {mismatches} mismatched shopping list rows'
+            )
+        self.stdout.write(self.style.SUCCESS('Shopping lists are consistent'))
+
+    @transaction.atomic
+    def rebuild(self):
+        ShoppingListItem.objects.all().delete()
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    amount=amount
+                )
+                for (user_id, ingredient_id), amount
+                in live_totals().items()
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        self.stdout.write('Shopping lists rebuilt')
+
+    def verify(self):
+        expected = live_totals()
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            )
+        }
+        mismatches = 0
+        for key in expected.keys() | stored.keys():
+            if expected.get(key) != stored.get(key):
+                mismatches += 1
+                user_id, ingredient_id = key
+                self.stdout.write(
+                    f'user {user_id}, ingredient {ingredient_id}: '
+                    f'stored {stored.get(key)}, expected {expected.get(key)}'
+                )
+        return mismatches
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from recipes.counters import COUNTERS, related_count
+
+
+class Command(BaseCommand):
+    help = 'Repairs denormalized favorite, cart, follower and recipe counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report drifted counters without fixing them',
+        )
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for model, field, related_model, related_field in COUNTERS:
+            with transaction.atomic():
+                drifted_ids = list(model.objects.annotate(
+                    live_count=related_count(related_model, related_field)
+                ).exclude(
+                    **{field: F('live_count')}
+                ).values_list('pk', flat=True))
+                if drifted_ids and not options['check']:
+                    model.objects.filter(pk__in=drifted_ids).update(
+                        **{field: related_count(related_model, related_field)}
+                    )
+            drifted += len(drifted_ids)
+            self.stdout.write(
+                f'{model._meta.model_name}.{field}: '
+                f'{len(drifted_ids)} drifted'
+            )
+        if options['check'] and drifted:
+            raise CommandError(f'Found {drifted} drifted counters')
+        self.stdout.write(self.style.SUCCESS('Counters are consistent'))
@@ -0,0 +1,118 @@
+import math
+from datetime import datetime, timezone
+from itertools import chain
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone as django_timezone
+
+from api.cache import SCORES_VERSION, bump_version
+from recipes.models import Favorite, Recipe, RecipeScore, ShoppingCart
+
+TRENDING_EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+
+def trending_score(dates):
+    """Сумма затухающих весов событий в логарифмической шкале.
+
+    Вес события - 2 ** (время от точки отсчёта / период полураспада):
+    каждое событие вдвое весомее произошедшего на период раньше.
+    Порядок рецептов не меняется со временем, поэтому пересчёт нужен
+    только при изменении избранного и списков покупок.
+    """
+    if not dates:
+        return 0
+    exponents = [
+        (date - TRENDING_EPOCH).total_seconds()
+        / settings.RECIPE_TRENDING_HALF_LIFE
+        for date in dates
+    ]
+    top = max(exponents)
+    return top + math.log2(sum(2 ** (value - top) for value in exponents))
+
+
+class Command(BaseCommand):
+    help = 'Refreshes popular and trending scores of changed recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recompute scores of all recipes',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Recipes recomputed per transaction',
+        )
+
+    def handle(self, *args, **options):
+        # Записи, добавленные во время пересчёта, попадут в следующий.
+        started = django_timezone.now()
+        recipes = Recipe.objects.order_by('pk')
+        if not options['full']:
+            recipes = recipes.filter(
+                Q(score__isnull=True)
+                | ~Q(score__favorites_count=F('favorites_count'))
+                | ~Q(score__carts_count=F('carts_count'))
+                | Exists(self.added_since_refresh(Favorite))
+                | Exists(self.added_since_refresh(ShoppingCart))
+            )
+        counts = list(
+            recipes.values_list('pk', 'favorites_count', 'carts_count')
+        )
+        batch_size = options['batch_size']
+        for start in range(0, len(counts), batch_size):
+            self.refresh(counts[start:start + batch_size], started)
+        if counts:
+            bump_version(SCORES_VERSION)
+        self.stdout.write(self.style.SUCCESS(
+            f'Recipe scores refreshed: {len(counts)}'
+        ))
+
+    @staticmethod
+    def added_since_refresh(model):
+        """Записи рецепта, появившиеся после его пересчёта.
+
+        Счётчики не ловят замену: удаление и добавление за один период
+        оставляют их прежними, а трендовый рейтинг меняется.
+        """
+        return model.objects.filter(
+            recipe=OuterRef('pk'), created__gte=OuterRef('score__updated_at')
+        )
+
+    @transaction.atomic
+    def refresh(self, counts, now):
+        recipe_ids = [recipe_id for recipe_id, *_ in counts]
+        dates = {}
+        for recipe_id, created in chain(
+            Favorite.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', 'created'),
+            ShoppingCart.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', 'created'),
+        ):
+            dates.setdefault(recipe_id, []).append(created)
+        existing = set(RecipeScore.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+        to_create, to_update = [], []
+        for recipe_id, favorites_count, carts_count in counts:
+            score = RecipeScore(
+                recipe_id=recipe_id,
+                popular=favorites_count + carts_count,
+                trending=trending_score(dates.get(recipe_id)),
+                favorites_count=favorites_count,
+                carts_count=carts_count,
+                updated_at=now,
+            )
+            if recipe_id in existing:
+                to_update.append(score)
+            else:
+                to_create.append(score)
+        RecipeScore.objects.bulk_create(to_create)
+        RecipeScore.objects.bulk_update(to_update, (
+            'popular', 'trending', 'favorites_count', 'carts_count',
+            'updated_at',
+        ))
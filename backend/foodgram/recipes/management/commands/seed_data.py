@@ -0,0 +1,239 @@
+import random
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from api.cache import (INGREDIENTS_VERSION, TAGS_VERSION, USERS_VERSION,
+                       bump_version)
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+BATCH_SIZE = 1000
+EMAIL_DOMAIN = 'seed.example.com'
+PASSWORD = 'seed-password'
+IMAGE_NAME = 'recipes/seed.png'
+ACTIVITY_DAYS = 60
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+    ('Десерт', '#F2C94C', 'dessert'),
+    ('Выпечка', '#BB6BD9', 'bakery'),
+    ('Постное', '#2F80ED', 'lenten'),
+)
+DISHES = ('суп', 'борщ', 'салат', 'пирог', 'каша', 'омлет', 'паста',
+          'рагу', 'плов', 'блины', 'запеканка', 'котлеты')
+ADJECTIVES = ('домашний', 'быстрый', 'острый', 'летний', 'сытный',
+              'лёгкий', 'праздничный', 'бабушкин')
+
+
+class PowerLaw:
+    """Выбор элементов с весами 1 / rank ** exponent."""
+    def __init__(self, rng, population, exponent=1.0):
+        self.rng = rng
+        self.population = population
+        self.cum_weights = list(accumulate(
+            1 / (rank + 1) ** exponent for rank in range(len(population))
+        ))
+
+    def sample(self, count):
+        """До count разных элементов, популярные выпадают чаще."""
+        count = min(count, len(self.population))
+        chosen = set()
+        for _ in range(count * 4):
+            chosen.update(self.rng.choices(
+                self.population, cum_weights=self.cum_weights,
+                k=count - len(chosen)
+            ))
+            if len(chosen) >= count:
+                break
+        return chosen
+
+
+class Command(BaseCommand):
+    help = ('Seeds a deterministic synthetic dataset: users, subscriptions, '
+            'recipes, favorites and carts with power-law distributions. '
+            f'Seed users log in with password "{PASSWORD}".')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--ingredients', type=int, default=2000,
+            help='Synthetic ingredients created when the table has fewer',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete previously seeded users and their data first',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if options['clear']:
+            deleted, _ = User.objects.filter(
+                email__endswith=f'@{EMAIL_DOMAIN}'
+            ).delete()
+            self.stdout.write(f'Deleted {deleted} seeded rows')
+        with transaction.atomic():
+            tags = self.seed_tags()
+            ingredients = self.seed_ingredients(options['ingredients'])
+            users = self.seed_users(options['users'])
+            authors = PowerLaw(rng, users, exponent=1.1)
+            recipes = self.seed_recipes(
+                rng, options['recipes'], authors, tags,
+                PowerLaw(rng, ingredients, exponent=0.9),
+            )
+            self.seed_subscriptions(rng, users, authors)
+            self.seed_user_recipes(
+                rng, users, PowerLaw(rng, recipes, exponent=1.0)
+            )
+        for command in ('rebuild_shopping_lists', 'reconcile_counters'):
+            call_command(command, stdout=self.stdout)
+        call_command('refresh_recipe_scores', '--full', stdout=self.stdout)
+        if connection.vendor == 'postgresql':
+            call_command('update_search_vectors', stdout=self.stdout)
+        for version in (TAGS_VERSION, INGREDIENTS_VERSION, USERS_VERSION):
+            bump_version(version)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(users)} users and {len(recipes)} recipes'
+        ))
+
+    def seed_tags(self):
+        for name, color, slug in TAGS:
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color}
+            )
+        return list(Tag.objects.order_by('pk').values_list('pk', flat=True))
+
+    def seed_ingredients(self, count):
+        missing = count - Ingredient.objects.count()
+        if missing > 0:
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=f'ингредиент {index}',
+                               measurement_unit='г')
+                    for index in range(missing)
+                ),
+                batch_size=BATCH_SIZE, ignore_conflicts=True,
+            )
+        return list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+        )
+
+    def seed_users(self, count):
+        start = User.objects.filter(
+            email__endswith=f'@{EMAIL_DOMAIN}'
+        ).count()
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (
+                User(
+                    email=f'user{index}@{EMAIL_DOMAIN}',
+                    username=f'seed_user_{index}',
+                    first_name=f'Имя{index}', last_name=f'Фамилия{index}',
+                    password=password,
+                )
+                for index in range(start, start + count)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        return list(User.objects.filter(
+            email__endswith=f'@{EMAIL_DOMAIN}'
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def seed_recipes(self, rng, count, authors, tags, ingredients):
+        if not default_storage.exists(IMAGE_NAME):
+            buffer = BytesIO()
+            Image.new('RGB', (600, 400), '#E26C2D').save(buffer, 'PNG')
+            default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+        last_pk = Recipe.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author_id=rng.choices(
+                        authors.population, cum_weights=authors.cum_weights
+                    )[0],
+                    name=(f'{rng.choice(ADJECTIVES).capitalize()} '
+                          f'{rng.choice(DISHES)} №{index}'),
+                    text=' '.join(rng.choices(DISHES + ADJECTIVES, k=30)),
+                    cooking_time=rng.randint(5, 180),
+                    image=IMAGE_NAME,
+                )
+                for index in range(count)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        recipes = list(Recipe.objects.filter(
+            pk__gt=last_pk
+        ).order_by('pk').values_list('pk', flat=True))
+        recipe_tags = []
+        recipe_ingredients = []
+        for recipe_id in recipes:
+            recipe_tags += [
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for tag_id in rng.sample(tags, rng.randint(1, 3))
+            ]
+            recipe_ingredients += [
+                RecipeIngredient(
+                    recipe_id=recipe_id, ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                )
+                for ingredient_id in ingredients.sample(rng.randint(3, 15))
+            ]
+        Recipe.tags.through.objects.bulk_create(
+            recipe_tags, batch_size=BATCH_SIZE
+        )
+        RecipeIngredient.objects.bulk_create(
+            recipe_ingredients, batch_size=BATCH_SIZE
+        )
+        return recipes
+
+    def seed_subscriptions(self, rng, users, authors):
+        Subscription.objects.bulk_create(
+            (
+                Subscription(user_id=user_id, author_id=author_id)
+                for user_id in users
+                for author_id in authors.sample(
+                    min(int(rng.paretovariate(1.2)) * 2, 100)
+                )
+                if author_id != user_id
+            ),
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+
+    def seed_user_recipes(self, rng, users, recipes):
+        """Избранное и корзины; даты добавления за последние дни."""
+        now = timezone.now()
+        activity = ((Favorite, 3, 300), (ShoppingCart, 1, 30))
+        for model, scale, limit in activity:
+            by_day = {}
+            for user_id in users:
+                count = min(int(rng.paretovariate(1.2) * scale), limit)
+                for recipe_id in recipes.sample(count):
+                    day = min(
+                        int(rng.expovariate(1 / 10)), ACTIVITY_DAYS - 1
+                    )
+                    by_day.setdefault(day, []).append(
+                        model(user_id=user_id, recipe_id=recipe_id)
+                    )
+            for day, objects in sorted(by_day.items()):
+                last_pk = model.objects.order_by('-pk').values_list(
+                    'pk', flat=True
+                ).first() or 0
+                model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+                model.objects.filter(pk__gt=last_pk).update(
+                    created=now - timedelta(days=day)
+                )
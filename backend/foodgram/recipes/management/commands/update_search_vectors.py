@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Recomputes full-text search vectors of recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Recipes updated per query',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Search vectors are stored only in PostgreSQL')
+        batch_size = options['batch_size']
+        recipe_ids = list(
+            Recipe.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        updated = 0
+        for start in range(0, len(recipe_ids), batch_size):
+            updated += Recipe.objects.filter(
+                pk__in=recipe_ids[start:start + batch_size]
+            ).update_search_vector()
+        self.stdout.write(self.style.SUCCESS(
+            f'Search vectors updated: {updated}'
+        ))
@@ -0,0 +1,181 @@
+"""Большие синтетические таблицы для бенчмарков (только PostgreSQL).
+
+Строки генерируются на стороне базы одним INSERT ... SELECT, поэтому
+миллион рецептов создаётся за секунды. Последовательность random()
+задаётся setseed, и при том же seed данные повторяются.
+"""
+import json
+from time import perf_counter
+
+from django.db import connection
+
+from recipes.management.commands.seed_data import (ADJECTIVES, DISHES,
+                                                   IMAGE_NAME)
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+TEXT_WORDS = 30
+VOCABULARY = 5000
+
+
+def set_seed(seed):
+    """Повторяемая последовательность random() в текущем соединении."""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT setseed(%s)', [seed % 1000 / 1000])
+
+
+def last_pk(model):
+    return model.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first() or 0
+
+
+def benchmark_author():
+    return User.objects.create(
+        email='benchmark@example.com', username='benchmark',
+        first_name='Бенчмарк', last_name='Бенчмарк',
+    )
+
+
+def ensure_ingredients(count):
+    """Не меньше count ингредиентов, id по порядку."""
+    missing = count - Ingredient.objects.count()
+    if missing > 0:
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+                for index in range(missing)
+            ),
+            batch_size=10000, ignore_conflicts=True,
+        )
+    return list(Ingredient.objects.order_by('pk').values_list(
+        'pk', flat=True
+    ))
+
+
+def ensure_tags(count):
+    """Не меньше count тегов, id по порядку."""
+    existing = Tag.objects.count()
+    Tag.objects.bulk_create(
+        Tag(
+            name=f'Тег {index}', color=f'#{index:06X}',
+            slug=f'benchmark-{index}',
+        )
+        for index in range(existing, count)
+    )
+    return list(Tag.objects.order_by('pk').values_list('pk', flat=True))
+
+
+def insert_recipes(count, author_id):
+    """count рецептов; возвращает id, после которого идут новые.
+
+    Название составляется из DISHES и ADJECTIVES, описание - из
+    TEXT_WORDS слов «словоN» словаря VOCABULARY, где слова с меньшим N
+    встречаются чаще.
+    """
+    start = last_pk(Recipe)
+    columns = {
+        field.name: field.column for field in Recipe._meta.concrete_fields
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {Recipe._meta.db_table} ('
+            f'{columns["author"]}, {columns["name"]}, {columns["image"]}, '
+            f'{columns["text"]}, {columns["cooking_time"]}, '
+            f'{columns["image_variants"]}, {columns["updated_at"]}, '
+            f'{columns["favorites_count"]}, {columns["carts_count"]}) '
+            'SELECT %(author)s, '
+            'initcap((%(adjectives)s::text[])[1 + floor(random() * '
+            'cardinality(%(adjectives)s::text[]))::int]) || \' \' || '
+            '(%(dishes)s::text[])[1 + floor(random() * '
+            'cardinality(%(dishes)s::text[]))::int] || \' №\' || number, '
+            '%(image)s, '
+            '(SELECT string_agg(\'слово\' || floor(power(random(), 3) * '
+            '%(vocabulary)s)::int, \' \') '
+            'FROM generate_series(1, %(text_words)s + 0 * number)), '
+            '5 + floor(random() * 175)::int, \'{}\', now(), 0, 0 '
+            'FROM generate_series(1, %(count)s) AS number',
+            {
+                'author': author_id, 'adjectives': list(ADJECTIVES),
+                'dishes': list(DISHES), 'vocabulary': VOCABULARY,
+                'image': IMAGE_NAME, 'text_words': TEXT_WORDS,
+                'count': count,
+            }
+        )
+    return start
+
+
+def insert_recipe_ingredients(after, per_recipe, ingredient_ids):
+    """До per_recipe ингредиентов каждому рецепту с id больше after.
+
+    Ингредиенты с меньшим id выпадают чаще: распределение
+    с тяжёлым хвостом, как у seed_data.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {RecipeIngredient._meta.db_table} '
+            '(recipe_id, ingredient_id, amount) '
+            'SELECT recipe.id, (%(ids)s::int[])[1 + floor(power(random(), 3)'
+            ' * cardinality(%(ids)s::int[]))::int], '
+            '1 + floor(random() * 500)::int '
+            f'FROM {Recipe._meta.db_table} AS recipe, '
+            'generate_series(1, %(per_recipe)s) '
+            'WHERE recipe.id > %(after)s',
+            {'ids': ingredient_ids, 'per_recipe': per_recipe, 'after': after}
+        )
+        return cursor.rowcount
+
+
+def insert_recipe_tags(after, per_recipe, tag_ids):
+    """До per_recipe разных тегов каждому рецепту с id больше after."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {Recipe.tags.through._meta.db_table} '
+            '(recipe_id, tag_id) '
+            'SELECT DISTINCT recipe.id, (%(ids)s::int[])[1 + floor(random() '
+            '* cardinality(%(ids)s::int[]))::int] '
+            f'FROM {Recipe._meta.db_table} AS recipe, '
+            'generate_series(1, %(per_recipe)s) '
+            'WHERE recipe.id > %(after)s',
+            {'ids': tag_ids, 'per_recipe': per_recipe, 'after': after}
+        )
+        return cursor.rowcount
+
+
+def analyze():
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def measure(func, repeat):
+    """Медиана и 95-й перцентиль времени вызова func в мс и его результат."""
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        result = func()
+        timings.append((perf_counter() - started) * 1000)
+    timings.sort()
+    return (
+        timings[len(timings) // 2],
+        timings[min(int(len(timings) * 0.95), len(timings) - 1)],
+        result,
+    )
+
+
+def plan_indexes(queryset):
+    """Индексы и последовательно читаемые таблицы в плане запроса."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    found, nodes = set(), [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if 'Index Name' in node:
+            found.add(node['Index Name'])
+        elif node['Node Type'] == 'Seq Scan':
+            found.add(f'seq scan {node["Relation Name"]}')
+        nodes.extend(node.get('Plans', ()))
+    return sorted(found)
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+PREFIX_INDEX = 'recipes_ingredient_name_upper_c'
+LIKE_INDEX = 'recipes_ingredient_name_upper_like'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {PREFIX_INDEX} ON recipes_ingredient '
+        f'((UPPER("name"::text) COLLATE "C"), id)'
+    )
+    schema_editor.execute(f'DROP INDEX IF EXISTS {LIKE_INDEX}')
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {LIKE_INDEX} ON recipes_ingredient '
+        f'USING btree (UPPER("name"::text) text_pattern_ops)'
+    )
+    schema_editor.execute(f'DROP INDEX IF EXISTS {PREFIX_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,6 +1,9 @@
 from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.utils import timezone
 
 from users.models import User
 
@@ -46,6 +49,79 @@ class Ingredient(models.Model):
         return (f'{self.name}, {self.measurement_unit}')
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_user_flags(self, user):
+        """Добавление признаков избранного и списка покупок пользователя."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+        )
+
+    def with_related_data(self, user):
+        """Подгрузка связанных данных для представления рецептов."""
+        return self.with_user_flags(user).defer(
+            'search_vector'
+        ).prefetch_related(
+            models.Prefetch(
+                'author', queryset=User.objects.with_is_subscribed(user)
+            ),
+            models.Prefetch('tags', queryset=Tag.objects.all()),
+            models.Prefetch(
+                'recipeingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+    def limited_per_author(self, limit):
+        """Не более limit рецептов каждого автора в одном запросе."""
+        return self.filter(
+            pk__in=models.Subquery(
+                Recipe.objects.filter(
+                    author=models.OuterRef('author')
+                ).values('pk')[:limit]
+            )
+        )
+
+    def update_search_vector(self):
+        """Пересчёт поискового вектора: название, ингредиенты, описание.
+
+        Вектор хранится только в PostgreSQL, в других базах поиск
+        идёт по вхождению подстроки.
+        """
+        if connections[self.db].vendor != 'postgresql':
+            return 0
+        config = settings.SEARCH_CONFIG
+        ingredient_names = models.Subquery(
+            RecipeIngredient.objects.filter(
+                recipe=models.OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                names=StringAgg('ingredient__name', ' ')
+            ).values('names')
+        )
+        return self.update(search_vector=(
+            SearchVector('name', weight='A', config=config)
+            + SearchVector(ingredient_names, weight='B', config=config)
+            + SearchVector('text', weight='C', config=config)
+        ))
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User, on_delete=models.CASCADE,
@@ -82,9 +158,33 @@ class Recipe(models.Model):
             )
         ]
     )
+    image_variants = models.JSONField(
+        'Уменьшенные копии картинки', default=dict, blank=True,
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения', auto_now=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном', default=0, editable=False,
+    )
+    carts_count = models.PositiveIntegerField(
+        'В списках покупок', default=0, editable=False,
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор', null=True, editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('name', )
+        indexes = [
+            models.Index(fields=('name', 'id'), name='recipe_name_id_idx'),
+            models.Index(
+                fields=('author', 'name', 'id'),
+                name='recipe_author_name_id_idx'
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -136,6 +236,9 @@ class BaseUserRecipe(models.Model):
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, verbose_name='Рецепт',
     )
+    created = models.DateTimeField(
+        'Дата добавления', auto_now_add=True,
+    )
 
     class Meta:
         abstract = True
@@ -154,6 +257,12 @@ class BaseUserRecipe(models.Model):
 class Favorite(BaseUserRecipe):
     class Meta:
         default_related_name = 'favorites'
+        indexes = [
+            models.Index(
+                fields=('recipe', 'created'),
+                name='favorite_recipe_created_idx'
+            ),
+        ]
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
 
@@ -161,5 +270,151 @@ class Favorite(BaseUserRecipe):
 class ShoppingCart(BaseUserRecipe):
     class Meta:
         default_related_name = 'carts'
+        indexes = [
+            models.Index(
+                fields=('recipe', 'created'),
+                name='cart_recipe_created_idx'
+            ),
+        ]
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+
+
+class RecipeScore(models.Model):
+    """Рейтинги рецепта для сортировки ленты.
+
+    Пересчитываются командой refresh_recipe_scores для рецептов,
+    у которых с updated_at появились записи избранного или списков
+    покупок либо изменились счётчики (удаление записей).
+    """
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True,
+        related_name='score', verbose_name='Рецепт',
+    )
+    popular = models.FloatField('Популярность', default=0)
+    trending = models.FloatField('Набирает популярность', default=0)
+    favorites_count = models.PositiveIntegerField(
+        'В избранном при пересчёте', default=0,
+    )
+    carts_count = models.PositiveIntegerField(
+        'В списках покупок при пересчёте', default=0,
+    )
+    updated_at = models.DateTimeField('Дата пересчёта', default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('-popular', 'recipe'), name='recipe_score_popular_idx'
+            ),
+            models.Index(
+                fields=('-trending', 'recipe'),
+                name='recipe_score_trending_idx'
+            ),
+        ]
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+
+    def __str__(self):
+        return f'{self.recipe}: {self.popular:g} / {self.trending:g}'
+
+
+class ShoppingListItemManager(models.Manager):
+    @staticmethod
+    def recipe_amounts(recipe_id):
+        """Количество каждого ингредиента в рецепте."""
+        amounts = {}
+        for ingredient_id, amount in RecipeIngredient.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount'):
+            amounts[ingredient_id] = amounts.get(ingredient_id, 0) + amount
+        return amounts
+
+    def apply_deltas(self, user_ids, deltas):
+        """Изменение итоговых количеств ингредиентов в списках покупок.
+
+        deltas - словарь {id ингредиента: изменение количества}.
+        Недостающие строки вставляются с нулевым количеством без ошибки
+        при одновременной вставке, затем все строки блокируются в порядке
+        pk: параллельные изменения ждут друг друга, а не теряются
+        и не взаимоблокируются.
+        """
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items() if delta
+        }
+        if not user_ids or not deltas:
+            return
+        with transaction.atomic():
+            self.bulk_create(
+                (
+                    self.model(
+                        user_id=user_id, ingredient_id=ingredient_id, amount=0
+                    )
+                    for user_id in sorted(user_ids)
+                    for ingredient_id in sorted(deltas)
+                    if deltas[ingredient_id] > 0
+                ),
+                ignore_conflicts=True,
+            )
+            to_update, to_delete = [], []
+            for item in self.select_for_update().filter(
+                user_id__in=user_ids, ingredient_id__in=deltas
+            ).order_by('pk'):
+                item.amount += deltas[item.ingredient_id]
+                if item.amount > 0:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.pk)
+            self.bulk_update(to_update, ('amount', ))
+            self.filter(pk__in=to_delete).delete()
+
+    def add_recipe(self, user_ids, recipe_id):
+        self.apply_deltas(user_ids, self.recipe_amounts(recipe_id))
+
+    def remove_recipe(self, user_ids, recipe_id):
+        self.apply_deltas(user_ids, {
+            ingredient_id: -amount
+            for ingredient_id, amount
+            in self.recipe_amounts(recipe_id).items()
+        })
+
+    def update_recipe(self, recipe_id, deltas):
+        """Перенос изменений состава рецепта в списки покупок."""
+        if not any(deltas.values()):
+            return
+        user_ids = list(ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True))
+        self.apply_deltas(user_ids, deltas)
+
+
+class ShoppingListItem(models.Model):
+    """Итоговое количество ингредиента в списке покупок пользователя.
+
+    Поддерживается приращениями при изменении списка покупок
+    и состава рецептов, пересчитывается командой rebuild_shopping_lists.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='shopping_list', verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE,
+        related_name='shopping_list_items', verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списках покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_user_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.amount}'
@@ -8,7 +8,8 @@ admin.site.empty_value_display = settings.EMPTY_VALUE
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'email', 'username', 'first_name', 'last_name')
+    list_display = ('pk', 'email', 'username', 'first_name', 'last_name',
+                    'followers_count', 'recipes_count')
     list_filter = ('username', 'email')
     search_fields = ('username', 'email', 'first_name', 'last_name')
 
@@ -1,10 +1,33 @@
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import UserManager as DjangoUserManager
 from django.db import models
 
 from users.validators import validate_username
 
 
+class UserQuerySet(models.QuerySet):
+    def with_is_subscribed(self, user):
+        """Добавление признака подписки пользователя на авторов."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_subscribed=models.Value(
+                    False, output_field=models.BooleanField()
+                )
+            )
+        return self.annotate(
+            is_subscribed=models.Exists(
+                Subscription.objects.filter(
+                    user=user, author=models.OuterRef('pk')
+                )
+            )
+        )
+
+
+class UserManager(DjangoUserManager.from_queryset(UserQuerySet)):
+    pass
+
+
 class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
@@ -27,6 +50,14 @@ class User(AbstractUser):
     password = models.CharField(
         'Пароль', max_length=settings.USER_FIELDS_MAX_LENGTH
     )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков', default=0, editable=False,
+    )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов', default=0, editable=False,
+    )
+
+    objects = UserManager()
 
     class Meta:
         ordering = ('username', )
@@ -36,6 +67,17 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    def refresh_from_db(self, using=None, fields=None):
+        """Все отложенные поля загружаются вместе при обращении к одному.
+
+        Пользователь из кэша токенов (api.authentication) создаётся
+        только с id и is_active.
+        """
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred.issuperset(fields):
+            fields = deferred
+        super().refresh_from_db(using, fields)
+
 
 class Subscription(models.Model):
     user = models.ForeignKey(